@@ -0,0 +1,255 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import create_annotations, generate_label_directory  # also makes src importable
+
+from app import LabelTool
+from deduplication import DUPLICATE_THRESHOLD, HASH_SIZE, cluster_hashes
+from engine import LabelingEngine
+from export import export_annotations
+from label_writer import LabelWriter
+from odgt_to_hico import convert_file
+from spatial_index import BBoxGridIndex
+from tile_renderer import TiledImageRenderer
+
+CHANGED_SHARE = 0.01  # label files rewritten before an incremental export
+SCENE_CHANGE_SHARE = 0.05  # frames that start a new scene in the perceptual hashes
+
+
+class StubCanvas:
+    # the parts of a Tk canvas the renderer and the hit-testing use, without a display
+    def canvasx(self, x):
+        return x
+
+    def canvasy(self, y):
+        return y
+
+    def winfo_width(self):
+        return 1
+
+    def winfo_height(self):
+        return 1
+
+
+def create_hit_test_tool(annotations):
+    tool = LabelTool.__new__(LabelTool)
+    tool.renderer = TiledImageRenderer(StubCanvas())
+    tool.annotations = annotations
+    tool.bbox_index = BBoxGridIndex()
+    tool.bbox_index.rebuild(annotations.get_coordinates())
+    tool.STATE = {'label_type': 'person', 'resizing': False}
+    return tool
+
+
+class Benchmarks:
+    def __init__(self, work_directory, args):
+        self.args = args
+        self.label_directory = os.path.join(work_directory, "labels")
+        self.odgt_path = os.path.join(work_directory, "labels.odgt")
+        self.output_directory = os.path.join(work_directory, "output")
+        os.makedirs(self.output_directory)
+
+        self.image_names = generate_label_directory(self.label_directory, args.frames, args.width, args.height,
+                                                    args.boxes, args.hoi_density, args.seed)
+        export_annotations(self.label_directory, self.odgt_path, incremental=False)
+
+        rng = random.Random(args.seed)
+        self.hit_test_tool = create_hit_test_tool(
+            create_annotations(rng, args.width, args.height, args.hit_test_boxes, args.hoi_density)
+        )
+        self.hit_test_points = [(rng.randrange(args.width), rng.randrange(args.height))
+                                for _ in range(args.hit_test_queries)]
+
+    def get_engine(self, writer=None):
+        return LabelingEngine(self.image_names, self.label_directory, writer=writer)
+
+    # every benchmark returns an optional setup and the measured function, which returns the number of items
+
+    def export_full(self):
+        output_path = os.path.join(self.output_directory, "full.odgt")
+        return None, lambda: export_annotations(self.label_directory, output_path, incremental=False)[0]
+
+    def export_incremental(self):
+        output_path = os.path.join(self.output_directory, "incremental.odgt")
+        engine = self.get_engine()
+        changed = range(0, len(self.image_names), max(1, round(1 / CHANGED_SHARE)))
+
+        def setup():
+            export_annotations(self.label_directory, output_path)
+            time.sleep(0.01)  # the manifest compares modification times
+            for index in changed:
+                annotations, _ = engine.load_annotations(index)
+                engine.save_annotations(index, annotations, self.args.width, self.args.height)
+
+        return setup, lambda: export_annotations(self.label_directory, output_path)[0]
+
+    def odgt_to_hico(self):
+        output_path = os.path.join(self.output_directory, "hico.json")
+        return None, lambda: convert_file(self.odgt_path, output_path, jobs=self.args.jobs)[0]
+
+    def label_load(self):
+        engine = self.get_engine()
+
+        def run():
+            for index in range(len(engine)):
+                engine.load_annotations(index)
+            return len(engine)
+
+        return None, run
+
+    def label_save(self):
+        # the asynchronous writer of the GUI, including the final flush
+        engine = self.get_engine()
+        annotations = [engine.load_annotations(index)[0] for index in range(len(engine))]
+        # one writer thread is reused by all runs, it has no way to be stopped
+        writer = LabelWriter(delay=0)
+        engine.writer = writer
+
+        def run():
+            for index, store in enumerate(annotations):
+                engine.save_annotations(index, store, self.args.width, self.args.height)
+            writer.flush()
+            return len(annotations)
+
+        return None, run
+
+    def check_resize_bbox(self):
+        tool = self.hit_test_tool
+
+        def run():
+            for x, y in self.hit_test_points:
+                tool.check_resize_bbox(x, y)
+            return len(self.hit_test_points)
+
+        return None, run
+
+    def get_closest_bbox_index_at_point(self):
+        tool = self.hit_test_tool
+
+        def run():
+            for x, y in self.hit_test_points:
+                tool.get_closest_bbox_index_at_point(x, y)
+            return len(self.hit_test_points)
+
+        return None, run
+
+    def cluster_hashes(self):
+        # perceptual hashes of video frames: runs of near-identical frames that differ in a few bits
+        rng = random.Random(self.args.seed)
+        bits = HASH_SIZE * HASH_SIZE
+        hashes = []
+        scene = rng.getrandbits(bits)
+        for _ in range(self.args.frames):
+            if rng.random() < SCENE_CHANGE_SHARE:
+                scene = rng.getrandbits(bits)
+            hash_value = scene
+            for _ in range(rng.randrange(DUPLICATE_THRESHOLD)):
+                hash_value ^= 1 << rng.randrange(bits)
+            hashes.append(hash_value)
+
+        return None, lambda: len(cluster_hashes(hashes))
+
+
+BENCHMARKS = ['export_full', 'export_incremental', 'odgt_to_hico', 'label_load', 'label_save', 'check_resize_bbox',
+              'get_closest_bbox_index_at_point', 'cluster_hashes']
+
+
+def measure(setup, run, repeat):
+    # the timed runs are done without tracemalloc, which slows down allocations; one extra run records the peak
+    seconds = []
+    items = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        items = run()
+        seconds.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        "items": items,
+        "seconds": seconds,
+        "best_seconds": best,
+        "items_per_second": items / best if best else None,
+        "peak_memory_bytes": peak
+    }
+
+
+def get_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark export, conversion, label I/O and hit-testing '
+                                                 'on a synthetic dataset.')
+    parser.add_argument('--frames', type=int, default=2000, help='Number of synthetic frames')
+    parser.add_argument('--width', type=int, default=1920, help='Image width of the frames')
+    parser.add_argument('--height', type=int, default=1080, help='Image height of the frames')
+    parser.add_argument('--boxes', type=int, default=8, help='Bounding boxes per frame')
+    parser.add_argument('--hoi-density', type=float, default=0.3,
+                        help='Probability that a person interacts with an object of the same frame')
+    parser.add_argument('--hit-test-boxes', type=int, default=200, help='Bounding boxes of the hit-testing frame')
+    parser.add_argument('--hit-test-queries', type=int, default=20000, help='Points queried by the hit-testing')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes of the ODGT to HICO conversion')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic dataset')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='Run only these benchmarks')
+    parser.add_argument('--output', help='Write the results to this JSON file instead of stdout')
+    args = parser.parse_args()
+
+    work_directory = tempfile.mkdtemp(prefix='hoi-benchmark-')
+    try:
+        benchmarks = Benchmarks(work_directory, args)
+        results = {}
+        for name in args.only or BENCHMARKS:
+            setup, run = getattr(benchmarks, name)()
+            results[name] = measure(setup, run, args.repeat)
+            print(f'{name}: {results[name]["items_per_second"]:.0f} items/s, '
+                  f'peak {results[name]["peak_memory_bytes"] / 2 ** 20:.1f} MiB', file=sys.stderr)
+    finally:
+        shutil.rmtree(work_directory)
+
+    report = {
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ('only', 'output')},
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import os
+import random
+import sys
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path[:0] = [SOURCE_DIRECTORY, os.path.join(SOURCE_DIRECTORY, "misc")]
+
+from export import get_label_file_name  # noqa: E402
+from label_writer import write_json_atomic  # noqa: E402
+from misc.annotations import AnnotationStore  # noqa: E402
+from misc.hico_classes import hico_classes_originID, hico_name2id  # noqa: E402
+
+OBJECT_TAGS = sorted(tag for tag in hico_classes_originID if tag != "person")
+INTERACTION_TAGS = sorted(hico_name2id)
+PERSON_SHARE = 0.4
+
+
+def get_image_name(index):
+    return f'frame_{index:06d}.jpg'
+
+
+def create_annotations(rng, width, height, boxes, hoi_density):
+    # boxes are placed uniformly; every person interacts with each object with probability hoi_density
+    store = AnnotationStore()
+    persons = max(1, round(boxes * PERSON_SHARE))
+    for idx in range(boxes):
+        box_width = rng.randint(max(2, width // 40), max(3, width // 4))
+        box_height = rng.randint(max(2, height // 40), max(3, height // 3))
+        x1 = rng.randrange(0, width - box_width)
+        y1 = rng.randrange(0, height - box_height)
+        if idx < persons:
+            tag, label_type = "person", "person"
+        else:
+            tag, label_type = rng.choice(OBJECT_TAGS), "object"
+        store.add_bbox((x1, y1, x1 + box_width - 1, y1 + box_height - 1), tag, label_type)
+
+    for subject_id in range(min(persons, boxes)):
+        for object_id in range(persons, boxes):
+            if rng.random() < hoi_density:
+                store.add_interaction(subject_id, object_id, rng.choice(INTERACTION_TAGS))
+    return store
+
+
+def write_frame(label_directory, index, store, width, height):
+    # in the layout of LabelTool.save_image; images are not needed
+    image_name = get_image_name(index)
+    write_json_atomic(get_label_file_name(image_name, label_directory), store.to_odgt(image_name, width, height),
+                      fsync=False)
+
+
+def generate_label_directory(label_directory, frames, width, height, boxes, hoi_density, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(label_directory, exist_ok=True)
+    for index in range(frames):
+        write_frame(label_directory, index, create_annotations(rng, width, height, boxes, hoi_density), width, height)
+    return [get_image_name(index) for index in range(frames)]
@@ -2,32 +2,74 @@
 #
 # SPDX-License-Identifier: MIT
 
+import argparse
 import json
-import math
 from pathlib import Path
 
-from PIL import Image, ImageTk
 import itertools
-import glob
-import os
 import customtkinter
 
-from export import export_annotations
+from deduplication import BackgroundDeduplication, Deduplicator
+from engine import LabelingEngine, OdgtReview, get_label_directory, get_image_manifest_path
+from history import AddBBox, AddInteraction, CommandHistory, DeleteBBox, DeleteInteraction, MoveBBox
+from image_cache import ImagePrefetcher
+from instrumentation import ENGINE_METHODS, PICKER_METHODS, PREFETCHER_METHODS, TOOL_METHODS, Instrumentation
+from label_db import LabelDatabase, get_database_path
+from label_picker import LabelPicker
+from label_writer import LabelWriter
+from misc.annotations import AnnotationStore, BBox, Interaction, get_label_type
+from misc.odgt_reader import OdgtReader
+from misc.vocabulary import Vocabulary
+from preannotation import PreAnnotator, get_iou
+from proxy_cache import ProxyCache
+from scanner import BackgroundScan
+from spatial_index import BBoxGridIndex
+from tile_renderer import TiledImageRenderer
+from tracking import MotionTracker
 
 COLORS = {'person': 'blue', 'object': 'green', 'interaction': 'red'}
 RESIZING_THRESHOLD = 20
+CORNER_SIZE = 5
+LABEL_FONT = ("TkDefaultFont", 12, "bold")
+LABEL_PADDING = 2
+ANNOTATION_TAG = "annotation"  # shared by all canvas items of bboxes and interactions
+HANDLE_TAG = "handle"
+SUGGESTION_TAG = "suggestion"  # dashed proposal boxes of the pre-annotation
+SUGGESTION_IOU = 0.5  # proposals overlapping a bbox of the same tag at least this much are not suggested
+PREANNOTATE_AHEAD = 4
+PENDING_WRITES_REFRESH_MS = 250
+SCAN_POLL_MS = 100
+DEDUPLICATION_POLL_MS = 200
+FULL_IMAGE_POLL_MS = 50
+SUGGESTION_POLL_MS = 100
+HUD_REFRESH_MS = 1000
+HUD_ROWS = 8
 
 
 class LabelTool:
-    def __init__(self, master, config_path="../config.json"):
+    def __init__(self, master, config_path="../config.json", instrument=False):
+        # optional latency instrumentation (--trace); the handlers are wrapped before they are bound to events
+        self.instrumentation = Instrumentation() if instrument else None
+        if self.instrumentation:
+            self.instrumentation.instrument(self, TOOL_METHODS)
+
         # private variables
         self.parent = master
         self.image_directory = ""
         self.image_paths = []
         self.label_directory = ""
+        self.engine = None
+        self.directory_scan = None  # BackgroundScan while a directory is still being listed
+        self.deduplication_pass = None  # BackgroundDeduplication while the duplicates of a directory are searched
+        self.hidden_duplicates = 0
+        self.label_writer = LabelWriter()
         self.image_index = 0
         self.total_images = 0
         self.current_image = None
+        self.image_prefetcher = ImagePrefetcher()
+        if self.instrumentation:
+            self.instrumentation.instrument(self.image_prefetcher, PREFETCHER_METHODS, "prefetcher.")
+        self.motion_tracker = MotionTracker()
         self.image_width = 0
         self.image_height = 0
 
@@ -39,6 +81,24 @@ class LabelTool:
 
         self.object_options = sorted(config["objects"])
         self.interaction_options = sorted(config["interactions"])
+        # "files" keeps one .txt per image, "sqlite" stores all labels of a directory in Labels/<dir>.sqlite
+        self.use_database = config.get("label_store", "files") == "sqlite"
+        # with proxy images, a cached preview is shown first and replaced by the full image once it is decoded
+        self.proxy_cache = ProxyCache() if config.get("proxy_images", False) else None
+        # e.g. {"backend": "opencv", "model": "models/yolov8n.onnx"}: detections are shown as suggestions
+        pre_annotation = config.get("pre_annotation")
+        self.pre_annotator = PreAnnotator(pre_annotation) if pre_annotation else None
+        self.suggestions = []  # BBoxes proposed for the current image, accepted with "s"
+        # e.g. {"method": "dhash", "threshold": 4}: only one frame of every cluster of near-identical frames is shown,
+        # its labels are exported for the others as well
+        deduplication = config.get("deduplication")
+        self.deduplicator = Deduplicator(**deduplication) if deduplication else None
+
+        self.vocabulary = Vocabulary()
+        for name in self.vocabulary.get_unknown_objects(self.object_options):
+            print(f"Warning: object '{name}' in {config_path} is not a HICO object class.")
+        for name in self.vocabulary.get_unknown_interactions(self.interaction_options):
+            print(f"Warning: interaction '{name}' in {config_path} is not a HICO interaction.")
 
         # initialize mouse state
         self.STATE = {
@@ -56,22 +116,23 @@ class LabelTool:
             'original_bbox': None
         }
 
-        # reference to bbox
-        self.bbox_ids = []  # (bbox_id, corner_ids, text_ids)
+        # bboxes and interactions of the current image
+        self.annotations = AnnotationStore()
+        self.history = CommandHistory()  # undo/redo of the edits on the current image
         self.bbox_id = None
-        self.bbox_coordinates = []  # (x1, y1, x2, y2) -> prio bboxList
-        self.bbox_tag = []
-        self.bbox_type = []
-        self.temp_corner_ids = []
+        self.bbox_index = BBoxGridIndex()
+        self.item_group_counter = itertools.count()
+        self.corner_handle_ids = []  # shared resize handles, shown for the bbox below the cursor
 
         # interaction management
         self.selected_objects = []
-        self.interaction_lines = []  #(line_id, [text])
-        self.interactions = []
 
         # mouse-cursor
         self.horizontal_line = None
         self.vertical_line = None
+        self.cursor_name = None
+        self.pending_motion_event = None  # latest <Motion> event, handled once the event queue is idle
+        self.motion_after_id = None
 
         # shortcuts
         self.parent.bind("a", self.prev_image)
@@ -80,6 +141,12 @@ class LabelTool:
         self.parent.bind("o", lambda event: self.set_label_type("object"))
         self.parent.bind("i", lambda event: self.set_label_type("interaction"))
         self.parent.bind("r", self.reset)
+        self.parent.bind("<Control-z>", self.undo)
+        self.parent.bind("<Control-y>", self.redo)
+        self.parent.bind("<Control-Z>", self.redo)  # Ctrl + Shift + Z
+        self.parent.bind("<Delete>", self.delete_at_cursor)
+        self.parent.bind("<BackSpace>", self.delete_at_cursor)
+        self.parent.bind("s", self.accept_suggestions)
 
         # Set up the main frame
         self.parent.title('HOI Labeling Tool')
@@ -99,10 +166,11 @@ class LabelTool:
                                                       orientation="vertical")
         self.scrollbar_x = customtkinter.CTkScrollbar(self.left_frame, command=self.canvas.xview,
                                                       orientation="horizontal")
-        self.canvas.configure(yscrollcommand=self.scrollbar_y.set, xscrollcommand=self.scrollbar_x.set)
+        self.canvas.configure(yscrollcommand=self.on_canvas_y_view, xscrollcommand=self.on_canvas_x_view)
         self.scrollbar_y.pack(side="right", fill="y")
         self.scrollbar_x.pack(side="bottom", fill="x")
         self.canvas.pack(side="left", fill="both", expand=True)
+        self.renderer = TiledImageRenderer(self.canvas)
 
         # Display mouse cross
         self.canvas.bind("<Button-1>", self.mouse_click)
@@ -120,6 +188,13 @@ class LabelTool:
         self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
         self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
 
+        # Zoom with Ctrl+Mouse Wheel or +/-
+        self.canvas.bind("<Control-MouseWheel>", self.on_zoom_scroll)
+        self.canvas.bind("<Control-Button-4>", lambda e: self.zoom(e, zoom_in=True))
+        self.canvas.bind("<Control-Button-5>", lambda e: self.zoom(e, zoom_in=False))
+        self.parent.bind("<plus>", lambda e: self.zoom(zoom_in=True))
+        self.parent.bind("<minus>", lambda e: self.zoom(zoom_in=False))
+
         self.placeholder_text = self.canvas.create_text(0, 0, text="Image Display Area", font=("TkDefaultFont", 24),
                                                         anchor="center")
         self.canvas.bind("<Configure>", self.update_canvas)
@@ -132,6 +207,10 @@ class LabelTool:
                                                        command=self.load_directory)
         self.button_load_dir.pack(pady=(20, 10), padx=10)
 
+        self.button_review = customtkinter.CTkButton(self.right_frame, text="Review ODGT", height=30, width=160,
+                                                     command=self.load_odgt)
+        self.button_review.pack(pady=(0, 10), padx=10)
+
         self.button_person = customtkinter.CTkButton(self.right_frame, text="Person  [ P ]", height=70,
                                                      command=lambda: self.set_label_type("person"))
         self.button_person.pack(pady=(20, 10), padx=10)
@@ -153,9 +232,14 @@ class LabelTool:
         # Checkbox
         self.checkbox_var = customtkinter.BooleanVar()
         self.checkbox = customtkinter.CTkCheckBox(self.right_frame, text="Keep annotations for next image.",
-                                                  variable=self.checkbox_var)
+                                                  variable=self.checkbox_var, command=self.schedule_tracking)
         self.checkbox.pack(pady=10, padx=10)
 
+        self.tracking_var = customtkinter.BooleanVar()
+        self.tracking_checkbox = customtkinter.CTkCheckBox(self.right_frame, text="Track kept boxes.",
+                                                           variable=self.tracking_var, command=self.schedule_tracking)
+        self.tracking_checkbox.pack(pady=(0, 10), padx=10)
+
         # Navigation Buttons
         self.navigation_frame = customtkinter.CTkFrame(self.right_frame, fg_color="transparent")
         self.navigation_frame.pack(pady=10, padx=10)
@@ -170,17 +254,29 @@ class LabelTool:
 
         self.image_index_label = customtkinter.CTkLabel(self.right_frame,
                                                         text=f"{self.image_index} / {self.total_images}")
-        self.image_index_label.pack(pady=20, padx=10)
+        self.image_index_label.pack(pady=(20, 0), padx=10)
+
+        self.pending_writes_label = customtkinter.CTkLabel(self.right_frame, text="Pending writes: 0")
+        self.pending_writes_label.pack(pady=(0, 20), padx=10)
+        self.update_pending_writes_label()
 
         self.export_button = customtkinter.CTkButton(self.right_frame, text="Export", height=50, width=160,
                                                      command=self.export)
         self.export_button.pack(pady=(10, 20), padx=10)
 
-    @staticmethod
-    def get_label_file_name(image_name, label_directory):
-        image_name_without_extension = os.path.splitext(image_name)[0]
-        label_name = image_name_without_extension + '.txt'
-        return os.path.join(label_directory, label_name)
+        # label pickers are created once and only shown when needed
+        self.object_picker = LabelPicker(self.parent, "Select Label", "Choose a label:", self.object_options)
+        self.interaction_picker = LabelPicker(self.parent, "Select Interaction", "Choose an interaction:",
+                                              self.interaction_options, allow_cancel=True)
+
+        if self.instrumentation:
+            self.instrumentation.instrument(self.object_picker, PICKER_METHODS, "object_picker.")
+            self.instrumentation.instrument(self.interaction_picker, PICKER_METHODS, "interaction_picker.")
+            self.hud_label = customtkinter.CTkLabel(self.left_frame, text="", justify="left", anchor="nw",
+                                                    font=("Courier", 11), fg_color=("gray90", "gray20"),
+                                                    corner_radius=4)
+            self.hud_label.place(x=8, y=8)
+            self.update_hud()
 
     def set_label_type(self, label_type):
         self.STATE['label_type'] = label_type
@@ -189,9 +285,12 @@ class LabelTool:
 
         self.STATE['label_tag'] = label_type
 
+    def get_image_coordinates(self, event):
+        return self.renderer.to_image(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+
     def mouse_click(self, event=None):
-        x_offset = int(self.canvas.canvasx(event.x))
-        y_offset = int(self.canvas.canvasy(event.y))
+        self.flush_motion()
+        x_offset, y_offset = map(int, self.get_image_coordinates(event))
 
         if self.STATE['label_type'] == 'interaction':
             self.label_interaction(x_offset, y_offset)
@@ -212,28 +311,19 @@ class LabelTool:
         closest_distance = float('inf')
         closest_bbox_index, closest_corner = None, None
 
-        for idx, bbox in enumerate(self.bbox_coordinates):
-            if self.bbox_type[idx] != self.STATE['label_type']:
+        for idx, corner_idx, distance in self.bbox_index.query_corners(x_offset, y_offset, 10 / self.renderer.zoom):
+            if self.annotations.bboxes[idx].label_type != self.STATE['label_type']:
                 continue
 
-            corners = [
-                (bbox[0], bbox[1]),  # top-left
-                (bbox[0], bbox[3]),  # bottom-left
-                (bbox[2], bbox[1]),  # top-right
-                (bbox[2], bbox[3])  # bottom-right
-            ]
-
-            for corner_idx, (cx, cy) in enumerate(corners):
-                distance = math.dist((x_offset, y_offset), (cx, cy))
-                if distance <= 10 and distance < closest_distance:
-                    closest_distance, closest_bbox_index, closest_corner = distance, idx, corner_idx
+            if distance < closest_distance:
+                closest_distance, closest_bbox_index, closest_corner = distance, idx, corner_idx
 
         if closest_bbox_index is not None:
             self.STATE.update({
                 'resizing': True,
                 'resize_corner': closest_corner,
                 'drag_bbox_index': closest_bbox_index,
-                'original_bbox': self.bbox_coordinates[closest_bbox_index],
+                'original_bbox': self.annotations.bboxes[closest_bbox_index].coordinates,
                 'drag_start_x': x_offset,
                 'drag_start_y': y_offset
             })
@@ -241,19 +331,18 @@ class LabelTool:
         return False
 
     def check_drag_bbox(self, x_offset, y_offset):
-        for idx, bbox in enumerate(self.bbox_coordinates):
-            if self.bbox_type[idx] != self.STATE['label_type']:
+        for idx in self.bbox_index.query_point(x_offset, y_offset):
+            if self.annotations.bboxes[idx].label_type != self.STATE['label_type']:
                 continue
 
-            if bbox[0] <= x_offset <= bbox[2] and bbox[1] <= y_offset <= bbox[3]:
-                self.STATE.update({
-                    'dragging': True,
-                    'drag_bbox_index': idx,
-                    'drag_start_x': x_offset,
-                    'drag_start_y': y_offset,
-                    'original_bbox': bbox
-                })
-                return True
+            self.STATE.update({
+                'dragging': True,
+                'drag_bbox_index': idx,
+                'drag_start_x': x_offset,
+                'drag_start_y': y_offset,
+                'original_bbox': self.annotations.bboxes[idx].coordinates
+            })
+            return True
         return False
 
     def handle_new_bbox(self, x_offset, y_offset):
@@ -265,86 +354,99 @@ class LabelTool:
             self.finalize_bbox(x1, y1, x2, y2)
 
     def mouse_release(self, event=None):
+        self.flush_motion()
         if self.STATE['dragging'] or self.STATE['resizing']:
+            idx = self.STATE['drag_bbox_index']
+            coordinates = self.annotations.bboxes[idx].coordinates
+            if coordinates != self.STATE['original_bbox']:
+                self.history.push(MoveBBox(idx, self.STATE['original_bbox'], coordinates))
+
             self.STATE['dragging'] = False
             self.STATE['resizing'] = False
             self.STATE['drag_bbox_index'] = None
             self.STATE['resize_corner'] = None
             self.STATE['original_bbox'] = None
+            self.schedule_tracking()
+
+    def draw_label_name(self, x1, y1, x2, y2, label_tag, label_type, group_tag):
+        x1, y1, x2, y2 = self.renderer.to_canvas(x1, y1, x2, y2)
+        text_x, text_y = self.get_label_position(x1, y1, x2, y2, label_type)
+        tags = (ANNOTATION_TAG, group_tag, f"{group_tag}-label")
+
+        text_id = self.canvas.create_text(text_x, text_y, text=label_tag, fill="white", font=LABEL_FONT, tags=tags)
+        text_x1, text_y1, text_x2, text_y2 = self.canvas.bbox(text_id)
+        background_id = self.canvas.create_rectangle(
+            text_x1 - LABEL_PADDING, text_y1 - LABEL_PADDING, text_x2 + LABEL_PADDING, text_y2 + LABEL_PADDING,
+            fill="black", outline="", tags=tags
+        )
+        self.canvas.tag_lower(background_id, text_id)
+
+        return text_id
 
-    def draw_label_name(self, x1, y1, x2, y2, label_tag, label_type):
-        label_text = label_tag
+    @staticmethod
+    def get_label_position(x1, y1, x2, y2, label_type):
         text_x = (x1 + x2) / 2
         if label_type == 'interaction':
-            text_y = (y1 + y2) // 2
-        else:
-            text_y = max(y1, y2) + 10
-        offsets = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-        text_ids = []
-        for dx, dy in offsets:
-            text_id = self.canvas.create_text(
-                text_x + dx, text_y + dy,
-                text=label_text,
-                fill='black',
-                font=("TkDefaultFont", 12, "bold")
-            )
-            text_ids.append(text_id)
+            return text_x, (y1 + y2) / 2
+        return text_x, max(y1, y2) + 10
 
-        text_id = self.canvas.create_text(
-            text_x, text_y,
-            text=label_text,
-            fill="white",
-            font=("TkDefaultFont", 12, "bold")
-        )
-        text_ids.append(text_id)
+    def move_label(self, text_id, group_tag, text_x, text_y):
+        # moves the text and its background together
+        current_x, current_y = self.canvas.coords(text_id)
+        self.canvas.move(f"{group_tag}-label", text_x - current_x, text_y - current_y)
 
-        return text_ids
+    def create_group_tag(self):
+        return f"group{next(self.item_group_counter)}"
 
     def mouse_move(self, event=None):
-        x_offset = self.canvas.canvasx(event.x)
-        y_offset = self.canvas.canvasy(event.y)
+        # high-rate mice send many more events than can be drawn, so only the latest position is processed
+        self.pending_motion_event = event
+        if self.motion_after_id is None:
+            self.motion_after_id = self.canvas.after_idle(self.process_motion)
 
-        if not self.current_image:
+    def flush_motion(self):
+        if self.motion_after_id is None:
+            return
+        self.canvas.after_cancel(self.motion_after_id)
+        self.process_motion()
+
+    def process_motion(self):
+        self.motion_after_id = None
+        x_offset, y_offset = self.get_image_coordinates(self.pending_motion_event)
+
+        if self.current_image is None:
             return
 
         self.draw_cursor(x_offset, y_offset)
 
         if not self.STATE['resizing'] and not self.STATE['dragging']:
-            cursor_near_corner = False
-            current_x = self.canvas.canvasx(event.x)
-            current_y = self.canvas.canvasy(event.y)
-
-            for bbox in self.bbox_coordinates:
-                corners = [
-                    (bbox[0], bbox[1]),
-                    (bbox[0], bbox[3]),
-                    (bbox[2], bbox[1]),
-                    (bbox[2], bbox[3])
-                ]
-                for cx, cy in corners:
-                    if math.dist((current_x, current_y), (cx, cy)) < RESIZING_THRESHOLD:
-                        self.parent.config(cursor="crosshair")
-                        cursor_near_corner = True
-                        break
-                if cursor_near_corner:
-                    break
-
-            if not cursor_near_corner:
-                self.parent.config(cursor="arrow")
+            threshold = RESIZING_THRESHOLD / self.renderer.zoom
+            near_corners = [
+                (distance, idx) for idx, _, distance in self.bbox_index.query_corners(x_offset, y_offset, threshold)
+                if distance < threshold
+            ]
+            self.set_cursor("crosshair" if near_corners else "arrow")
+
+            if self.STATE['click'] == 1:
+                self.update_bbox_preview(x_offset, y_offset)
+                return
+
+            if near_corners:
+                hovered_index = min(near_corners)[1]
+            else:
+                hovered_index = self.get_closest_bbox_index_at_point(x_offset, y_offset)
+            if hovered_index is None:
+                self.show_corner_handles(None)
+            else:
+                self.show_corner_handles(self.annotations.bboxes[hovered_index].coordinates)
+            return
 
         if self.STATE['resizing']:
             self.handle_resize(x_offset, y_offset)
-            self.parent.config(cursor="fleur")
-            return
-
-        if self.STATE['dragging']:
+        else:
             self.handle_drag(x_offset, y_offset)
-            self.parent.config(cursor="fleur")
-            return
-
-        if self.STATE['click'] == 1:
-            self.update_bbox_preview(x_offset, y_offset)
+        self.set_cursor("fleur")
+        self.show_corner_handles(self.annotations.bboxes[self.STATE['drag_bbox_index']].coordinates)
 
     def handle_resize(self, x_offset, y_offset):
         delta_x = x_offset - self.STATE['drag_start_x']
@@ -369,55 +471,38 @@ class LabelTool:
             max(new_coords[1], new_coords[3])
         )
 
-        idx = self.STATE['drag_bbox_index']
-        self.bbox_coordinates[idx] = new_coords
+        self.move_bbox(self.STATE['drag_bbox_index'], new_coords)
+
+    def move_bbox(self, idx, coordinates):
+        self.annotations.move_bbox(idx, coordinates)
+        self.bbox_index.update(idx, self.annotations.bboxes[idx].coordinates)
         self.update_bbox_ui(idx)
         self.update_interaction_lines(idx)
 
     def update_bbox_ui(self, idx):
-        bbox_id, corner_ids, text_ids = self.bbox_ids[idx]
-        x1, y1, x2, y2 = self.bbox_coordinates[idx]
+        bbox = self.annotations.bboxes[idx]
+        bbox_id, text_id, group_tag = bbox.item_ids
+        x1, y1, x2, y2 = self.renderer.to_canvas(*bbox.coordinates)
 
         self.canvas.coords(bbox_id, x1, y1, x2, y2)
+        self.move_label(text_id, group_tag, *self.get_label_position(x1, y1, x2, y2, bbox.label_type))
 
-        corners = [
-            (x1, y1), (x1, y2),
-            (x2, y1), (x2, y2)
-        ]
-        for i, corner_id in enumerate(corner_ids):
-            x, y = corners[i]
-            self.canvas.coords(corner_id, x - 5, y - 5, x + 5, y + 5)
+    def update_interaction_lines(self, bbox_index):
+        moved_center = self.renderer.to_canvas(*self.annotations.bboxes[bbox_index].get_center())
 
-        text_x = (x1 + x2) / 2
-        text_y = max(y1, y2) + 10
-        offsets = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for i in range(4):
-            self.canvas.coords(text_ids[i],
-                               text_x + offsets[i][0],
-                               text_y + offsets[i][1]
-                               )
-        self.canvas.coords(text_ids[4], text_x, text_y)
+        for interaction in self.annotations.get_bbox_interactions(bbox_index):
+            line_id, text_id, group_tag = interaction.item_ids
+            # only the moved endpoint needs a new center, the other one is unchanged
+            x1, y1 = moved_center if interaction.subject_id == bbox_index else self.get_canvas_center(
+                interaction.subject_id)
+            x2, y2 = moved_center if interaction.object_id == bbox_index else self.get_canvas_center(
+                interaction.object_id)
 
-    def update_interaction_lines(self, bbox_index):
-        for i, interaction in enumerate(self.interactions):
-            if interaction['subject_id'] == bbox_index or interaction['object_id'] == bbox_index:
-                line_id, text_ids = self.interaction_lines[i]
-                sub_bbox = self.bbox_coordinates[interaction['subject_id']]
-                obj_bbox = self.bbox_coordinates[interaction['object_id']]
-
-                x1, y1 = self.get_bbox_center(sub_bbox)
-                x2, y2 = self.get_bbox_center(obj_bbox)
-                self.canvas.coords(line_id, x1, y1, x2, y2)
-
-                text_x = (x1 + x2) / 2
-                text_y = (y1 + y2) / 2
-                offsets = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-                for j in range(4):
-                    self.canvas.coords(text_ids[j],
-                                       text_x + offsets[j][0],
-                                       text_y + offsets[j][1]
-                                       )
-                self.canvas.coords(text_ids[4], text_x, text_y)
+            self.canvas.coords(line_id, x1, y1, x2, y2)
+            self.move_label(text_id, group_tag, *self.get_label_position(x1, y1, x2, y2, 'interaction'))
+
+    def get_canvas_center(self, bbox_index):
+        return self.renderer.to_canvas(*self.annotations.bboxes[bbox_index].get_center())
 
     def handle_drag(self, x_offset, y_offset):
         delta_x = x_offset - self.STATE['drag_start_x']
@@ -429,21 +514,15 @@ class LabelTool:
         new_x2 = orig[2] + delta_x
         new_y2 = orig[3] + delta_y
 
-        idx = self.STATE['drag_bbox_index']
-        self.bbox_coordinates[idx] = (new_x1, new_y1, new_x2, new_y2)
-
-        self.update_bbox_ui(idx)
-        self.update_interaction_lines(idx)
+        self.move_bbox(self.STATE['drag_bbox_index'], (new_x1, new_y1, new_x2, new_y2))
 
     def update_bbox_preview(self, x_offset, y_offset):
-        self.remove_temporary_bbox()
-        self.bbox_id, self.temp_corner_ids = self.draw_bbox(
-            self.STATE['x'],
-            self.STATE['y'],
-            x_offset,
-            y_offset,
-            self.STATE['label_type']
-        )
+        coordinates = (self.STATE['x'], self.STATE['y'], x_offset, y_offset)
+        if self.bbox_id:
+            self.canvas.coords(self.bbox_id, *self.renderer.to_canvas(*coordinates))
+        else:
+            self.bbox_id = self.draw_bbox(*coordinates, self.STATE['label_type'])
+        self.show_corner_handles(coordinates)
 
     def finalize_bbox(self, x1, y1, x2, y2):
         self.remove_temporary_bbox()
@@ -451,65 +530,35 @@ class LabelTool:
         if self.STATE['label_type'] == 'object':
             self.show_object_selection_popup()
 
-        bbox_id, corner_ids, text_ids = self.draw_bbox_with_label(
-            x1, y1, x2, y2,
-            self.STATE['label_type'],
-            self.STATE['label_tag']
-        )
-
-        self.bbox_coordinates.append((x1, y1, x2, y2))
-        self.bbox_type.append(self.STATE['label_type'])
-        self.bbox_tag.append(self.STATE['label_tag'])
-        self.bbox_ids.append((bbox_id, corner_ids, text_ids))
+        bbox = BBox((x1, y1, x2, y2), self.STATE['label_tag'], self.STATE['label_type'])
+        self.history.execute(AddBBox(len(self.annotations), bbox), self)
 
         self.STATE['click'] = 0
         self.bbox_id = None
-        self.temp_corner_ids = []
+        self.schedule_tracking()
 
     def remove_temporary_bbox(self):
         if self.bbox_id:
             self.canvas.delete(self.bbox_id)
-        if self.temp_corner_ids:
-            for corner_id in self.temp_corner_ids:
-                self.canvas.delete(corner_id)
+        self.show_corner_handles(None)
 
     def cancel_bbox(self, event=None):  # noqa
         if self.STATE['click'] == 0:
             return
 
-        if self.bbox_id:
-            self.canvas.delete(self.bbox_id)
-            self.bbox_id = None
-            self.STATE['click'] = 0
-
-        for corner_id in self.temp_corner_ids:
-            self.canvas.delete(corner_id)
-            self.temp_corner_ids = []
+        self.remove_temporary_bbox()
+        self.bbox_id = None
+        self.STATE['click'] = 0
 
     def get_closest_bbox_index_at_point(self, x, y):
-        candidates = []
-        for i, (x1, y1, x2, y2) in enumerate(self.bbox_coordinates):
-            if x1 <= x <= x2 and y1 <= y <= y2:
-                candidates.append(i)
-
+        candidates = self.bbox_index.query_point(x, y)
         if not candidates:
             return None
 
         best_index = None
         best_distance = float('inf')
 
-        for i in candidates:
-            (x1, y1, x2, y2) = self.bbox_coordinates[i]
-            corners = [
-                (x1, y1),
-                (x1, y2),
-                (x2, y1),
-                (x2, y2)
-            ]
-            min_corner_distance = min(
-                math.dist((x, y), corner) for corner in corners
-            )
-
+        for i, min_corner_distance in zip(candidates, self.annotations.get_corner_distances(x, y, candidates)):
             if min_corner_distance < best_distance:
                 best_distance = min_corner_distance
                 best_index = i
@@ -521,7 +570,7 @@ class LabelTool:
         if closest_bbox_id is None:
             return
 
-        bbox_id, _, _ = self.bbox_ids[closest_bbox_id]
+        bbox_id = self.annotations.bboxes[closest_bbox_id].item_ids[0]
 
         if bbox_id in self.selected_objects:
             self.selected_objects.remove(bbox_id)
@@ -529,7 +578,7 @@ class LabelTool:
             return
 
         self.selected_objects.append(bbox_id)
-        label_type = self.bbox_type[closest_bbox_id]
+        label_type = self.annotations.bboxes[closest_bbox_id].label_type
         self.canvas.itemconfig(bbox_id, fill=COLORS[label_type], stipple="gray50")
 
         if len(self.selected_objects) != 2:
@@ -540,51 +589,115 @@ class LabelTool:
             self.reset_label_interaction()
             return
 
-        sub = next((index for index, triplet in enumerate(self.bbox_ids) if triplet[0] == self.selected_objects[0]),
-                   None)
-        obj = next((index for index, triplet in enumerate(self.bbox_ids) if triplet[0] == self.selected_objects[1]),
-                   None)
+        sub = self.annotations.get_bbox_index_by_item(self.selected_objects[0])
+        obj = self.annotations.get_bbox_index_by_item(self.selected_objects[1])
 
-        if self.bbox_type[sub] != "person":
+        if self.annotations.bboxes[sub].label_type != "person":
             sub, obj = obj, sub
 
-        line_id, line_text_ids = self.draw_interaction(sub, obj, self.STATE['label_tag'], self.STATE['label_type'])
-        self.interaction_lines.append((line_id, line_text_ids))
-        interaction = {
-            "object_id": obj,
-            "interaction": interaction_label,
-            "subject_id": sub
-        }
+        interaction = Interaction(sub, obj, interaction_label)
+        self.history.execute(AddInteraction(len(self.annotations.interactions), interaction), self)
 
-        self.interactions.append(interaction)
+        self.reset_label_interaction()
 
+    def insert_bbox(self, idx, bbox):
+        last = len(self.annotations)
+        self.annotations.insert_bbox(idx, bbox)
+        if idx != last:
+            # the bbox that was at idx moved to the end
+            self.bbox_index.remove(idx)
+            self.bbox_index.insert(last, self.annotations.bboxes[last].coordinates)
+        self.bbox_index.insert(idx, bbox.coordinates)
+
+        self.annotations.set_bbox_items(idx, self.draw_bbox_with_label(*bbox.coordinates, bbox.label_type, bbox.tag))
+
+    def remove_bbox(self, idx):
+        last = len(self.annotations) - 1
+        bbox = self.annotations.remove_bbox(idx)
+        self.bbox_index.remove(idx)
+        if idx != last:
+            # the last bbox took the place of the removed one
+            self.bbox_index.remove(last)
+            self.bbox_index.insert(idx, self.annotations.bboxes[idx].coordinates)
+
+        self.canvas.delete(bbox.item_ids[2])
+        bbox.item_ids = None
+
+    def insert_interaction(self, idx, interaction):
+        self.annotations.insert_interaction(idx, interaction)
+        interaction.item_ids = self.draw_interaction(interaction.subject_id, interaction.object_id,
+                                                     interaction.interaction, 'interaction')
+
+    def remove_interaction(self, idx):
+        interaction = self.annotations.remove_interaction(idx)
+        self.canvas.delete(interaction.item_ids[2])
+        interaction.item_ids = None
+
+    def can_edit_history(self):
+        if self.current_image is None or self.STATE['dragging'] or self.STATE['resizing']:
+            return False
+
+        self.cancel_bbox()
         self.reset_label_interaction()
+        self.show_corner_handles(None)
+        return True
+
+    def undo(self, event=None):  # noqa
+        if self.can_edit_history() and self.history.undo(self):
+            self.schedule_tracking()
+
+    def redo(self, event=None):  # noqa
+        if self.can_edit_history() and self.history.redo(self):
+            self.schedule_tracking()
+
+    def delete_at_cursor(self, event=None):  # noqa
+        if self.pending_motion_event is None or not self.can_edit_history():
+            return
+
+        # an interaction line or label under the cursor is deleted before the bbox below it
+        canvas_x = self.canvas.canvasx(self.pending_motion_event.x)
+        canvas_y = self.canvas.canvasy(self.pending_motion_event.y)
+        items = set(self.canvas.find_overlapping(canvas_x - 2, canvas_y - 2, canvas_x + 2, canvas_y + 2))
+        for idx, interaction in enumerate(self.annotations.interactions):
+            if items.intersection(interaction.item_ids[:2]):
+                self.history.execute(DeleteInteraction(idx, interaction), self)
+                return
+
+        idx = self.get_closest_bbox_index_at_point(*self.get_image_coordinates(self.pending_motion_event))
+        if idx is None:
+            return
+
+        # interactions are removed from the highest index down, so the recorded indexes stay valid
+        interaction_indexes = sorted(self.annotations.bbox_interactions.get(idx, ()), reverse=True)
+        interactions = [(i, self.annotations.interactions[i]) for i in interaction_indexes]
+        self.history.execute(DeleteBBox(idx, self.annotations.bboxes[idx], interactions), self)
+        self.schedule_tracking()
 
     def draw_interaction(self, sub_id, obj_id, label_tag, label_type):
-        center1 = self.get_bbox_center(self.bbox_coordinates[sub_id])
-        center2 = self.get_bbox_center(self.bbox_coordinates[obj_id])
+        center1 = self.annotations.bboxes[sub_id].get_center()
+        center2 = self.annotations.bboxes[obj_id].get_center()
+        group_tag = self.create_group_tag()
         line_id = self.canvas.create_line(
-            center1[0], center1[1], center2[0], center2[1], fill="orange", width=4
+            *self.renderer.to_canvas(center1[0], center1[1], center2[0], center2[1]), fill="orange", width=4,
+            tags=(ANNOTATION_TAG, group_tag)
         )
 
-        line_text_ids = self.draw_label_name(center1[0], center1[1], center2[0], center2[1], label_tag, label_type)
+        text_id = self.draw_label_name(center1[0], center1[1], center2[0], center2[1], label_tag, label_type,
+                                       group_tag)
 
-        return line_id, line_text_ids
-
-    @staticmethod
-    def get_bbox_center(bbox):
-        x1, y1, x2, y2 = bbox
-        x_center = (x1 + x2) / 2
-        y_center = (y1 + y2) / 2
-        return x_center, y_center
+        return line_id, text_id, group_tag
 
     def reset_label_interaction(self):
-        for bbox_id, _, _ in self.bbox_ids:
+        for bbox_id in self.selected_objects:
             self.canvas.itemconfig(bbox_id, fill="", stipple="")
 
         self.selected_objects = []
 
     def update_canvas(self, event=None):  # noqa
+        if self.current_image is not None:
+            self.renderer.schedule_render()
+            return
+
         self.canvas.coords(
             self.placeholder_text,
             self.canvas.winfo_width() // 2,
@@ -592,122 +705,302 @@ class LabelTool:
         )
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
+    def on_canvas_x_view(self, first, last):
+        self.scrollbar_x.set(first, last)
+        self.renderer.schedule_render()
+
+    def on_canvas_y_view(self, first, last):
+        self.scrollbar_y.set(first, last)
+        self.renderer.schedule_render()
+
     def on_vertical_scroll(self, event):
         self.canvas.yview_scroll(-1 * (event.delta // 120), "units")
 
     def on_horizontal_scroll(self, event):
         self.canvas.xview_scroll(-1 * (event.delta // 120), "units")
 
+    def on_zoom_scroll(self, event):
+        self.zoom(event, zoom_in=event.delta > 0)
+
+    def zoom(self, event=None, zoom_in=True):
+        if self.current_image is None:
+            return
+
+        anchor_x, anchor_y = (event.x, event.y) if event else (0, 0)
+        if zoom_in:
+            changed = self.renderer.zoom_in(anchor_x, anchor_y)
+        else:
+            changed = self.renderer.zoom_out(anchor_x, anchor_y)
+
+        if changed:
+            self.redraw_annotations()
+
     def export(self, event=None):
         export_file_path = customtkinter.filedialog.asksaveasfilename(title="Save File As", defaultextension=".odgt",
                                                                       filetypes=[("Annotation Files", "*.odgt"),
                                                                                  ("All Files", "*.*")])
 
-        if self.label_directory:
-            export_annotations(self.label_directory, export_file_path)
+        if self.engine:
+            self.engine.export(export_file_path)
 
     def load_directory(self):
-        self.image_directory = customtkinter.filedialog.askdirectory(title="Select Directory")
+        image_directory = customtkinter.filedialog.askdirectory(title="Select Directory")
+        if not image_directory:
+            return
+
+        self.image_directory = image_directory
+        self.label_directory = get_label_directory(self.image_directory)
+        database = LabelDatabase(get_database_path(self.label_directory)) if self.use_database else None
+        self.set_engine(LabelingEngine([], self.label_directory, writer=self.label_writer, database=database,
+                                       fan_out_duplicates=self.deduplicator is not None))
+
+        # the first images are shown while large directories are still being listed
+        self.directory_scan = BackgroundScan(self.image_directory,
+                                             manifest_path=get_image_manifest_path(self.label_directory))
+        self.poll_directory_scan(self.directory_scan)
+
+    def load_odgt(self):
+        odgt_path = customtkinter.filedialog.askopenfilename(title="Select ODGT File",
+                                                             filetypes=[("Annotation Files", "*.odgt"),
+                                                                        ("All Files", "*.*")])
+        if not odgt_path:
+            return
+        image_directory = customtkinter.filedialog.askdirectory(title="Select Image Directory")
+        if not image_directory:
+            return
+
+        # the frames are read from the ODGT file on demand; changes are not saved
+        try:
+            reader = OdgtReader(odgt_path)
+        except OSError as error:
+            print(f'Could not open {odgt_path}: {error}')
+            return
+        try:
+            review = OdgtReview(reader, image_directory)
+        except ValueError as error:
+            reader.close()
+            print(f'Could not review {odgt_path}: {error}')
+            return
 
-        allowed_extensions = ['*.jpg', '*.jpeg', '*.png']
-        self.image_paths = list(itertools.chain.from_iterable(
-            glob.glob(os.path.join(self.image_directory, ext)) for ext in allowed_extensions
-        ))
-        self.image_paths.sort()
-        if len(self.image_paths) == 0:
-            print('No images found.')
+        self.image_directory = image_directory
+        self.label_directory = ""
+        self.set_engine(review)
+        self.directory_scan = None
+        if len(self.engine) == 0:
+            print('No frames found.')
             return
+        print(f'Reviewing {odgt_path}: changes are not saved.')
+        self.set_image_paths(self.engine.image_paths)
 
-        directory_name = os.path.basename(self.image_directory)
-        self.label_directory = os.path.join("Labels", directory_name)
-        os.makedirs(self.label_directory, exist_ok=True)
+    def set_engine(self, engine):
+        if self.engine:
+            self.engine.close()
+        self.engine = engine
+        if self.instrumentation:
+            self.instrumentation.instrument(engine, ENGINE_METHODS, "engine.")
 
-        self.image_index = 1
-        self.total_images = len(self.image_paths)
+        self.reset()
+        self.image_paths = []
+        self.image_index = 0
+        self.total_images = 0
+        self.image_prefetcher.set_image_paths([])
+        self.deduplication_pass = None
+        self.hidden_duplicates = 0
+
+    def poll_directory_scan(self, directory_scan):
+        if directory_scan is not self.directory_scan:
+            return  # another directory was opened in the meantime
+
+        done = directory_scan.is_done()
+        if done or not self.image_paths:
+            image_paths = directory_scan.get_image_paths()
+            if image_paths:
+                self.set_image_paths(image_paths)
+
+        if done:
+            self.directory_scan = None
+            if not self.image_paths:
+                print('No images found.')
+            elif self.deduplicator:
+                # all images are shown until the duplicates are known, afterwards only the representatives
+                self.deduplication_pass = BackgroundDeduplication(self.deduplicator, self.image_paths,
+                                                                  self.label_directory)
+                self.poll_deduplication(self.deduplication_pass)
+            self.update_image_index_label()
+            return
+
+        self.update_image_index_label()
+        self.parent.after(SCAN_POLL_MS, self.poll_directory_scan, directory_scan)
 
-        self.load_image()
+    def poll_deduplication(self, deduplication_pass):
+        if deduplication_pass is not self.deduplication_pass:
+            return  # another directory was opened in the meantime
+
+        if not deduplication_pass.is_done():
+            self.parent.after(DEDUPLICATION_POLL_MS, self.poll_deduplication, deduplication_pass)
+            return
+
+        clusters = deduplication_pass.get_result()
+        self.deduplication_pass = None
+        self.hidden_duplicates = sum(len(duplicates) for duplicates in clusters.values())
+        representatives = {duplicate: representative
+                           for representative, duplicates in clusters.items() for duplicate in duplicates}
+        self.set_image_paths(list(clusters), representatives)
+        self.update_image_index_label()
+
+    def set_image_paths(self, image_paths, representatives=None):
+        # representatives: path of a duplicate that is no longer shown -> path of the image shown instead
+        current_path = self.image_paths[self.image_index - 1] if self.image_index else None
+        hidden = representatives is not None and current_path in representatives
+        if hidden and (len(self.annotations) or self.engine.has_labels(self.image_index - 1)):
+            # labels of the open duplicate are kept, but an unlabeled one is not saved, so that it still
+            # receives the labels of its representative on export
+            self.save_image()
+
+        self.image_paths = image_paths
+        self.engine.image_paths = image_paths
+        self.total_images = len(image_paths)
+        self.image_prefetcher.set_image_paths(image_paths, keep_cache=True)
+
+        if current_path is None:
+            self.image_index = 1
+            self.load_image()
+        elif hidden:
+            self.image_index = image_paths.index(representatives[current_path]) + 1
+            self.reset()
+            self.load_image()
+        else:
+            # the complete listing is sorted differently than the first images found, so the open image is looked up
+            self.image_index = image_paths.index(current_path) + 1
+            # the new paths cleared the queue, which may still have held the full image of a shown proxy
+            self.image_prefetcher.request(self.image_index - 1)
+
+    def get_display_image(self, index):
+        # returns the image to show first, the factor it is reduced by and the size of the full image
+        if self.proxy_cache:
+            image = self.image_prefetcher.get_cached(index)
+            if image is not None:
+                self.image_prefetcher.prefetch(index)
+                return image, 1, image.size
+            try:
+                proxy = self.proxy_cache.get(self.image_paths[index])
+            except OSError as error:
+                print(f'Could not load proxy of {self.image_paths[index]}: {error}')
+            else:
+                if proxy is not None:
+                    # the full image is decoded in the background, before the images around it
+                    self.image_prefetcher.request(index)
+                    return proxy
+        # small images are shown in full right away, from the prefetch cache
+        image = self.image_prefetcher.get(index)
+        return image, 1, image.size
+
+    def poll_full_image(self, proxy):
+        if self.current_image is not proxy:
+            return  # another image was loaded in the meantime
+
+        image = self.image_prefetcher.get_cached(self.image_index - 1)
+        if image is not None:
+            self.current_image = image
+            self.renderer.set_image(image)
+        elif self.image_prefetcher.is_pending(self.image_index - 1):
+            self.parent.after(FULL_IMAGE_POLL_MS, self.poll_full_image, proxy)
 
     def load_image(self, next_or_prev=0):
         image_path = self.image_paths[self.image_index - 1]
-        image = Image.open(image_path)
-        self.current_image = ImageTk.PhotoImage(image)
-        self.image_width = image.width
-        self.image_height = image.height
+        image, reduction, (self.image_width, self.image_height) = self.get_display_image(self.image_index - 1)
+        self.current_image = image
 
         self.canvas.delete("all")
+        self.history.clear()
+        self.suggestions = []
+        self.horizontal_line = None
+        self.vertical_line = None
+        self.corner_handle_ids = []
 
         self.canvas.update_idletasks()
-        self.canvas.create_image(0, 0, anchor="nw", image=self.current_image)
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        self.renderer.set_image(image, reduction)
+        if reduction > 1:
+            # bbox coordinates stay in full resolution, the renderer scales the proxy to match them
+            self.poll_full_image(image)
 
         self.update_image_index_label()
 
         self.image_file_name = Path(image_path).name
         self.parent.title(f'{self.image_file_name} - HOI Labeling Tool')
 
-        self.label_file_name = self.get_label_file_name(self.image_file_name, self.label_directory)
-        loading_label_file_name = self.get_loading_file_name(next_or_prev)
-        if not Path(loading_label_file_name).exists():
+        self.label_file_name = self.engine.get_label_location(self.image_index - 1)
+        annotations, loading_label_file_name = self.engine.load_annotations(self.image_index - 1, next_or_prev,
+                                                                            self.checkbox_var.get())
+        if annotations is None:
+            self.request_suggestions()
             return
 
-        with open(loading_label_file_name, "r") as file:
-            data = json.load(file)
-
-        for gtbox in data["gtboxes"]:
-            x1, y1, width, height = map(int, gtbox["box"])
-            x2, y2 = x1 + width - 1, y1 + height - 1
-
-            label_type = "person" if gtbox["tag"] == "person" else "object"
-            bbox_id, corner_ids, text_ids = self.draw_bbox_with_label(x1, y1, x2, y2, label_type, gtbox['tag'])
-
-            self.bbox_coordinates.append((x1, y1, x2, y2))
-            self.bbox_type.append(label_type)
-            self.bbox_tag.append(gtbox["tag"])
-            self.bbox_ids.append((bbox_id, corner_ids, text_ids))
-
-        for conn in data["hoi"]:
-            sub, obj, interaction = conn['subject_id'], conn['object_id'], conn['interaction']
-
-            line_id, line_text_ids = self.draw_interaction(sub, obj, interaction, 'interaction')
-            self.interaction_lines.append((line_id, line_text_ids))
-            interaction = {
-                "object_id": obj,
-                "interaction": interaction,
-                "subject_id": sub
-            }
-
-            self.interactions.append(interaction)
+        unknown_tags = self.vocabulary.get_unknown_objects(bbox.tag for bbox in annotations.bboxes)
+        unknown_tags += self.vocabulary.get_unknown_interactions(hoi.interaction for hoi in annotations.interactions)
+        if unknown_tags:
+            print(f"Warning: {loading_label_file_name} contains unknown tags: {', '.join(sorted(set(unknown_tags)))}")
+
+        if next_or_prev and self.is_tracking_enabled():
+            source_path = self.image_paths[self.image_index - 1 + next_or_prev]
+            tracked = self.motion_tracker.track(source_path, image_path, annotations.get_coordinates())
+            for idx, coordinates in enumerate(tracked):
+                annotations.move_bbox(idx, coordinates)
+
+        self.annotations = annotations
+        self.bbox_index.rebuild(self.annotations.get_coordinates())
+        self.draw_annotations()
+        self.schedule_tracking()
+        self.request_suggestions()
+
+    def request_suggestions(self):
+        if self.pre_annotator is None:
+            return
+        # the following images are detected in the background while the current one is labeled
+        index = self.image_index - 1
+        self.pre_annotator.prefetch(self.image_paths[index:index + PREANNOTATE_AHEAD + 1])
+        self.poll_suggestions(self.image_paths[index])
 
-    def get_loading_file_name(self, next_or_prev):
-        load_prev_annotations = self.checkbox_var.get()
-        if not load_prev_annotations:
-            return str(self.label_file_name)
+    def poll_suggestions(self, image_path):
+        if not self.image_index or self.image_paths[self.image_index - 1] != image_path:
+            return  # another image was loaded in the meantime
 
-        prior_image_path = self.image_paths[self.image_index - 1 + next_or_prev]
-        prior_image_name = Path(prior_image_path).name
-        prior_label_file_name = self.get_label_file_name(prior_image_name, self.label_directory)
+        if self.pre_annotator.is_pending(image_path):
+            self.parent.after(SUGGESTION_POLL_MS, self.poll_suggestions, image_path)
+            return
 
-        return str(prior_label_file_name)
+        allowed_tags = set(self.object_options) | {"person"}
+        self.suggestions = [
+            BBox(coordinates, tag, get_label_type(tag))
+            for tag, _, coordinates in self.pre_annotator.get(image_path) or []
+            if tag in allowed_tags and not any(
+                bbox.tag == tag and get_iou(coordinates, bbox.coordinates) >= SUGGESTION_IOU
+                for bbox in self.annotations.bboxes
+            )
+        ]
+        self.draw_suggestions()
+
+    def draw_suggestions(self):
+        self.canvas.delete(SUGGESTION_TAG)
+        for bbox in self.suggestions:
+            x1, y1, x2, y2 = self.renderer.to_canvas(*bbox.coordinates)
+            self.canvas.create_rectangle(x1, y1, x2, y2, width=2, dash=(6, 4), outline=COLORS[bbox.label_type],
+                                         tags=(SUGGESTION_TAG,))
+            self.canvas.create_text(x1 + LABEL_PADDING, y1 + LABEL_PADDING, text=f'{bbox.tag}?', anchor="nw",
+                                    fill=COLORS[bbox.label_type], font=LABEL_FONT, tags=(SUGGESTION_TAG,))
+
+    def accept_suggestions(self, event=None):  # noqa
+        # the suggestions become regular bboxes that can be edited, undone or deleted
+        if not self.suggestions or not self.can_edit_history():
+            return
+        for bbox in self.suggestions:
+            self.history.execute(AddBBox(len(self.annotations), bbox), self)
+        self.suggestions = []
+        self.canvas.delete(SUGGESTION_TAG)
+        self.schedule_tracking()
 
     def save_image(self):
-        data = {
-            "file_name": self.image_file_name,
-            "height": self.image_height,
-            "width": self.image_width,
-            "gtboxes": [
-                {
-                    "tag": self.bbox_tag[i],
-                    "box": [int(x_min), int(y_min), int(width), int(height)]
-                }
-                for i, bbox in enumerate(self.bbox_coordinates)
-                for x_min, y_min, x_max, y_max in [bbox]
-                for width, height in [(x_max - x_min + 1, y_max - y_min + 1)]
-            ],
-            "hoi": self.interactions
-        }
-
-        with open(self.label_file_name, 'w', encoding="utf-8") as file:
-            json.dump(data, file)  # type: ignore
+        self.engine.save_annotations(self.image_index - 1, self.annotations, self.image_width, self.image_height)
 
     def prev_image(self, event=None):  # noqa
         self.save_image()
@@ -728,132 +1021,155 @@ class LabelTool:
         self.load_image(-1)
 
     def reset(self, event=None):  # noqa
-        for bbox_id, corner_ids, text_ids in self.bbox_ids:
-            self.canvas.delete(bbox_id)
-            for corner_id in corner_ids:
-                self.canvas.delete(corner_id)
-            for text_id in text_ids:
-                self.canvas.delete(text_id)
-
-        self.bbox_ids = []
-        self.bbox_id = None
-        self.bbox_coordinates = []
-        self.bbox_tag = []
-        self.bbox_type = []
+        self.delete_annotation_items()
 
-        for line, text_ids in self.interaction_lines:
-            self.canvas.delete(line)
-            for text_id in text_ids:
-                self.canvas.delete(text_id)
+        self.annotations.clear()
+        self.history.clear()
+        self.bbox_id = None
+        self.bbox_index.clear()
 
         self.selected_objects = []
-        self.interaction_lines = []
-        self.interactions = []
-
-    def update_image_index_label(self):
-        self.image_index_label.configure(text=f"{self.image_index} / {self.total_images}")
 
-    def show_object_selection_popup(self):
-        def enable_ok_button():
-            if label_var.get():
-                ok_button.configure(state="normal")
+    def delete_annotation_items(self):
+        self.canvas.delete(ANNOTATION_TAG)
+        self.show_corner_handles(None)
 
-        popup = customtkinter.CTkToplevel(self.parent)
-        popup.title("Select Label")
-        popup.geometry("200x300")
+        for idx in range(len(self.annotations)):
+            self.annotations.set_bbox_items(idx, None)
+        for interaction in self.annotations.interactions:
+            interaction.item_ids = None
 
-        popup.protocol("WM_DELETE_WINDOW", lambda: None)
-        popup.update_idletasks()
-        popup.grab_set()
+    def draw_annotations(self):
+        for idx, bbox in enumerate(self.annotations.bboxes):
+            item_ids = self.draw_bbox_with_label(*bbox.coordinates, bbox.label_type, bbox.tag)
+            self.annotations.set_bbox_items(idx, item_ids)
 
-        label_var = customtkinter.StringVar(value="")
-        popup_frame = customtkinter.CTkScrollableFrame(popup, width=180, height=200)
-        popup_frame.pack(fill="both", expand=True)
-        customtkinter.CTkLabel(popup_frame, text="Choose a label:").pack(pady=10)
+        for interaction in self.annotations.interactions:
+            interaction.item_ids = self.draw_interaction(interaction.subject_id, interaction.object_id,
+                                                         interaction.interaction, 'interaction')
 
-        for label in self.object_options:
-            radio = customtkinter.CTkRadioButton(popup_frame, text=label, variable=label_var, value=label,
-                                                 command=enable_ok_button)
-            radio.pack(pady=2, padx=10, anchor="w")
+    def redraw_annotations(self):
+        self.cancel_bbox()
+        self.reset_label_interaction()
+        self.delete_annotation_items()
+        self.draw_annotations()
+        self.draw_suggestions()
 
-        ok_button = customtkinter.CTkButton(popup_frame, text="OK", state="disabled",
-                                            command=lambda: self.set_label_from_popup(popup, label_var))
-        ok_button.pack(pady=(20, 10))
+    def update_image_index_label(self):
+        text = f"{self.image_index} / {self.total_images}"
+        if self.directory_scan:
+            text += f" ({self.directory_scan.get_found_count()} found)"
+        elif self.deduplication_pass:
+            text += " (finding duplicates)"
+        elif self.hidden_duplicates:
+            text += f" ({self.hidden_duplicates} duplicates hidden)"
+        self.image_index_label.configure(text=text)
+
+    def update_pending_writes_label(self):
+        self.pending_writes_label.configure(text=f"Pending writes: {self.label_writer.get_pending_count()}")
+        self.parent.after(PENDING_WRITES_REFRESH_MS, self.update_pending_writes_label)
+
+    def update_hud(self):
+        # p50/p99 latency of the slowest actions
+        self.hud_label.configure(text=self.instrumentation.format_summary(HUD_ROWS) or "No actions yet")
+        self.parent.after(HUD_REFRESH_MS, self.update_hud)
+
+    def is_tracking_enabled(self):
+        # the frames of a review carry their own boxes, which are not copies of the previous frame
+        return self.checkbox_var.get() and self.tracking_var.get() and not isinstance(self.engine, OdgtReview)
+
+    def schedule_tracking(self):
+        # the boxes are tracked into the next frame in the background while the current frame is labeled
+        if not self.is_tracking_enabled() or self.image_index >= self.total_images:
+            return
+        coordinates = self.annotations.get_coordinates()
+        if coordinates:
+            self.motion_tracker.submit(self.image_paths[self.image_index - 1], self.image_paths[self.image_index],
+                                       coordinates)
+
+    def close(self):
+        self.label_writer.flush()
+        if self.engine:
+            self.engine.close()
+        self.motion_tracker.shutdown()
+        if self.pre_annotator:
+            self.pre_annotator.shutdown()
+        if self.instrumentation:
+            self.instrumentation.close()
+        self.parent.destroy()
 
-        popup.wait_window()
+    def show_object_selection_popup(self):
+        # an object always needs a label, so this picker cannot be closed without choosing one
+        self.STATE['label_tag'] = self.object_picker.show()
 
     def get_interaction_label(self):
-        popup = customtkinter.CTkToplevel(self.parent)
-        popup.title("Select Interaction")
-        popup.geometry("200x300")
-
-        popup.update_idletasks()
-        popup.grab_set()
+        interaction_label = self.interaction_picker.show()
+        if interaction_label:
+            self.STATE['label_tag'] = interaction_label
+        return interaction_label
 
-        popup_frame = customtkinter.CTkScrollableFrame(popup, width=180, height=200)
-        popup_frame.pack(fill="both", expand=True)
-        customtkinter.CTkLabel(popup_frame, text="Choose a interaction:").pack(pady=10)
-
-        interaction_var = customtkinter.StringVar()
-        for label in self.interaction_options:
-            customtkinter.CTkRadioButton(popup_frame, text=label, variable=interaction_var, value=label).pack(pady=2,
-                                                                                                              padx=10,
-                                                                                                              anchor="w")
-
-        customtkinter.CTkButton(popup_frame, text="OK",
-                                command=lambda: self.set_label_from_popup(popup, interaction_var)).pack(pady=(20, 10))
-
-        popup.wait_window()
-        return interaction_var.get()
+    def draw_cursor(self, x, y):
+        x, y, width, height = self.renderer.to_canvas(x, y, self.image_width, self.image_height)
 
-    def set_label_from_popup(self, popup, label_var):
-        selected_tag = label_var.get()
-        self.STATE['label_tag'] = selected_tag
-        popup.destroy()
+        if self.horizontal_line is None:
+            self.horizontal_line = self.canvas.create_line(0, y, width, y, width=2)
+            self.vertical_line = self.canvas.create_line(x, 0, x, height, width=2)
+            return
 
-    def draw_cursor(self, x, y):
-        if self.horizontal_line:
-            self.canvas.delete(self.horizontal_line)
-        self.horizontal_line = self.canvas.create_line(0, y, self.current_image.width(), y, width=2)
+        self.canvas.coords(self.horizontal_line, 0, y, width, y)
+        self.canvas.coords(self.vertical_line, x, 0, x, height)
 
-        if self.vertical_line:
-            self.canvas.delete(self.vertical_line)
-        self.vertical_line = self.canvas.create_line(x, 0, x, self.current_image.height(), width=2)
+    def set_cursor(self, cursor_name):
+        if cursor_name == self.cursor_name:
+            return
+        self.cursor_name = cursor_name
+        self.parent.config(cursor=cursor_name)
 
     def draw_bbox_with_label(self, x1, y1, x2, y2, label_type, label_tag):
-        bbox_id, corner_ids = self.draw_bbox(x1, y1, x2, y2, label_type)
-        text_ids = self.draw_label_name(x1, y1, x2, y2, label_tag, label_tag)
+        group_tag = self.create_group_tag()
+        bbox_id = self.draw_bbox(x1, y1, x2, y2, label_type, (ANNOTATION_TAG, group_tag))
+        text_id = self.draw_label_name(x1, y1, x2, y2, label_tag, label_type, group_tag)
 
-        return bbox_id, corner_ids, text_ids
+        return bbox_id, text_id, group_tag
 
-    def draw_bbox(self, x1, y1, x2, y2, label_type):
-        bbox_id = self.canvas.create_rectangle(
+    def draw_bbox(self, x1, y1, x2, y2, label_type, tags=()):
+        x1, y1, x2, y2 = self.renderer.to_canvas(x1, y1, x2, y2)
+        return self.canvas.create_rectangle(
             x1, y1, x2, y2,
             width=2,
-            outline=COLORS[label_type]
+            outline=COLORS[label_type],
+            tags=tags
         )
 
-        corner_size = 5
-        corner_ids = []
-        for x, y in [
-            (x1, y1),
-            (x1, y2),
-            (x2, y1),
-            (x2, y2)
-        ]:
-            corner_id = self.canvas.create_rectangle(
-                x - corner_size, y - corner_size, x + corner_size, y + corner_size,
-                fill='red', outline='red'
-            )
-            corner_ids.append(corner_id)
+    def show_corner_handles(self, coordinates):
+        if coordinates is None:
+            if self.corner_handle_ids:
+                self.canvas.itemconfig(HANDLE_TAG, state="hidden")
+            return
+
+        if not self.corner_handle_ids:
+            self.corner_handle_ids = [
+                self.canvas.create_rectangle(0, 0, 0, 0, fill='red', outline='red', tags=(HANDLE_TAG,))
+                for _ in range(4)
+            ]
 
-        return bbox_id, corner_ids
+        x1, y1, x2, y2 = self.renderer.to_canvas(*coordinates)
+        for corner_id, (x, y) in zip(self.corner_handle_ids, [(x1, y1), (x1, y2), (x2, y1), (x2, y2)]):
+            self.canvas.coords(corner_id, x - CORNER_SIZE, y - CORNER_SIZE, x + CORNER_SIZE, y + CORNER_SIZE)
+        self.canvas.itemconfig(HANDLE_TAG, state="normal")
+        self.canvas.tag_raise(HANDLE_TAG)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HOI Labeling Tool')
+    parser.add_argument('--trace', action='store_true',
+                        help='Show action latencies and write a Chrome trace of the session to Traces/')
+    args = parser.parse_args()
+
     customtkinter.set_appearance_mode('system')
     customtkinter.set_default_color_theme('blue')
 
     root = customtkinter.CTk()
-    tool = LabelTool(root)
+    tool = LabelTool(root, instrument=args.trace)
+    root.protocol("WM_DELETE_WINDOW", tool.close)
     root.mainloop()
@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def map_in_threads(function, items, workers):
+    # decoding and resizing images release the GIL, so threads are enough to keep several cores busy
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, items))
+
+
+class BackgroundTask:
+    # runs a function in a daemon thread; the GUI polls is_done and then reads the result
+    def __init__(self, function, *args):
+        self.result = None
+        self.done = False
+        self.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.run, args=(function, args), daemon=True)
+        self.thread.start()
+
+    def run(self, function, args):
+        result = function(*args)
+        with self.lock:
+            self.result = result
+            self.done = True
+
+    def is_done(self):
+        with self.lock:
+            return self.done
+
+    def get_result(self):
+        with self.lock:
+            return self.result
+
+
+class BackgroundPool:
+    # Process pool for work the GUI requests ahead of time. It is started on the first task, and once more than
+    # max_pending tasks are kept the oldest ones are cancelled, as the GUI has moved on from them.
+    def __init__(self, workers, max_pending, initializer=None, initargs=()):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.initializer = initializer
+        self.initargs = initargs
+        self.executor = None
+        self.futures = OrderedDict()  # key -> future, oldest first
+
+    def submit(self, key, function, *args):
+        if key in self.futures:
+            self.futures.move_to_end(key)
+            return self.futures[key]
+
+        if self.executor is None:
+            # the GUI runs Tk and several threads, so workers are spawned instead of forked
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=self.initializer, initargs=self.initargs)
+
+        future = self.executor.submit(function, *args)
+        self.futures[key] = future
+        while len(self.futures) > self.max_pending:
+            _, outdated = self.futures.popitem(last=False)
+            outdated.cancel()
+        return future
+
+    def get_future(self, key):
+        return self.futures.get(key)
+
+    def discard(self, key):
+        self.futures.pop(key, None)
+
+    def shutdown(self):
+        # also recovers from a BrokenProcessPool: the next task starts new workers
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.futures.clear()
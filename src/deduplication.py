@@ -0,0 +1,229 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from background import BackgroundTask, map_in_threads
+from engine import get_label_directory, get_image_manifest_path
+from export import DUPLICATES_NAME
+from label_writer import write_json_atomic
+from scanner import list_images
+
+HASHES_NAME = ".image_hashes.json"
+HASH_SIZE = 8  # hashes have HASH_SIZE * HASH_SIZE bits
+DUPLICATE_THRESHOLD = 4  # largest Hamming distance between a duplicate and its representative
+HASH_WORKERS = 4
+DRAFT_SIZE = 128  # JPEG images are decoded at the smallest scale that is at least this size
+
+
+def pack_bits(bits):
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def get_dhash(image, hash_size):
+    # whether each pixel is brighter than its left neighbour
+    pixels = np.asarray(image.resize((hash_size + 1, hash_size), Image.Resampling.BOX), dtype=np.int16)
+    return pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def get_dct_matrix(size):
+    frequencies = np.arange(size)[:, None]
+    positions = np.arange(size)[None, :]
+    return np.cos(np.pi * (2 * positions + 1) * frequencies / (2 * size))
+
+
+def get_phash(image, hash_size):
+    # whether each of the lowest frequencies of the DCT is above their median, without the mean brightness
+    size = hash_size * 4
+    pixels = np.asarray(image.resize((size, size), Image.Resampling.BOX), dtype=np.float64)
+    dct = get_dct_matrix(size)
+    frequencies = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    return pack_bits(frequencies > np.median(frequencies.flatten()[1:]))
+
+
+HASH_METHODS = {"dhash": get_dhash, "phash": get_phash}
+
+
+def compute_hash(image_path, method="dhash", hash_size=HASH_SIZE):
+    with Image.open(image_path) as image:
+        image.draft("L", (DRAFT_SIZE, DRAFT_SIZE))
+        return HASH_METHODS[method](image.convert("L"), hash_size)
+
+
+def get_distance(hash_value, other):
+    return (hash_value ^ other).bit_count()
+
+
+class HammingIndex:
+    # The hashes are split into threshold + 1 bands. Two hashes within the threshold differ in at most threshold
+    # bands, so they are equal in at least one band and only hashes sharing a band with the query are compared.
+    def __init__(self, bits, threshold):
+        if not 0 <= threshold < bits:
+            raise ValueError(f'The threshold has to be between 0 and {bits - 1}, got {threshold}')
+        self.threshold = threshold
+        edges = [bits * band // (threshold + 1) for band in range(threshold + 2)]
+        self.bands = [(low, (1 << (high - low)) - 1) for low, high in zip(edges, edges[1:])]  # (shift, mask)
+        self.tables = [{} for _ in self.bands]  # band value -> positions of the hashes
+        self.hashes = []
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, hash_value):
+        position = len(self.hashes)
+        self.hashes.append(hash_value)
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            table.setdefault((hash_value >> shift) & mask, []).append(position)
+        return position
+
+    def search(self, hash_value):
+        # [(position, distance)] of the hashes within the threshold
+        candidates = set()
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            candidates.update(table.get((hash_value >> shift) & mask, ()))
+        matches = []
+        for position in candidates:
+            distance = get_distance(hash_value, self.hashes[position])
+            if distance <= self.threshold:
+                matches.append((position, distance))
+        return matches
+
+
+def cluster_hashes(hashes, threshold=DUPLICATE_THRESHOLD, bits=HASH_SIZE * HASH_SIZE):
+    # Frames are clustered in order: a frame joins the closest representative within the threshold or becomes a
+    # representative itself. Unlike grouping neighbours transitively, a slow camera pan never chains into one
+    # cluster, so every duplicate stays close to the frame whose labels it receives.
+    index = HammingIndex(bits, threshold)
+    representatives = []  # position of the representative of every index entry
+    assignment = []  # position -> position of its representative
+    for position, hash_value in enumerate(hashes):
+        matches = index.search(hash_value) if hash_value is not None else []
+        if matches:
+            nearest, _ = min(matches, key=lambda match: (match[1], match[0]))
+            assignment.append(representatives[nearest])
+        else:
+            if hash_value is not None:
+                index.add(hash_value)
+                representatives.append(position)
+            assignment.append(position)
+    return assignment
+
+
+def load_hash_cache(cache_path, method, hash_size):
+    # image path -> [size, mtime_ns, hash as hex]
+    try:
+        with open(cache_path, 'r') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("method") != method or cache.get("hash_size") != hash_size:
+        return {}
+    return cache["images"]
+
+
+class Deduplicator:
+    def __init__(self, method="dhash", hash_size=HASH_SIZE, threshold=DUPLICATE_THRESHOLD, workers=HASH_WORKERS):
+        if method not in HASH_METHODS:
+            raise ValueError(f'Unknown hash method {method!r}, expected one of {", ".join(HASH_METHODS)}')
+        HammingIndex(hash_size * hash_size, threshold)  # checks the threshold
+        self.method = method
+        self.hash_size = hash_size
+        self.threshold = threshold
+        self.workers = workers
+
+    def compute_hashes(self, image_paths, cache_path=None):
+        # only images that are new or changed since the last run are hashed; None for unreadable images
+        cache = load_hash_cache(cache_path, self.method, self.hash_size) if cache_path else {}
+
+        def get_hash(image_path):
+            try:
+                stat = os.stat(image_path)
+                key = os.path.abspath(image_path)
+                cached = cache.get(key)
+                if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                    return key, cached
+                hash_value = compute_hash(image_path, self.method, self.hash_size)
+                return key, [stat.st_size, stat.st_mtime_ns, f'{hash_value:x}']
+            except OSError as error:
+                print(f'Could not hash {image_path}: {error}')
+                return None, None
+
+        results = map_in_threads(get_hash, image_paths, self.workers)
+
+        if cache_path:
+            images = {key: entry for key, entry in results if key is not None}
+            try:
+                write_json_atomic(cache_path, {"method": self.method, "hash_size": self.hash_size, "images": images},
+                                  fsync=False)
+            except OSError as error:
+                print(f'Could not write image hashes {cache_path}: {error}')
+        return [int(entry[2], 16) if entry else None for _, entry in results]
+
+    def find_clusters(self, image_paths, cache_path=None):
+        # representative path -> paths of its duplicates, in the order of image_paths
+        hashes = self.compute_hashes(image_paths, cache_path)
+        assignment = cluster_hashes(hashes, self.threshold, self.hash_size * self.hash_size)
+        clusters = {}
+        for position, representative in enumerate(assignment):
+            if position == representative:
+                clusters[image_paths[position]] = []
+            else:
+                clusters[image_paths[representative]].append(image_paths[position])
+        return clusters
+
+    def deduplicate(self, image_paths, label_directory):
+        # the duplicates are stored in the label directory, where the export fans the labels of every
+        # representative out to its unlabeled duplicates
+        clusters = self.find_clusters(image_paths, os.path.join(label_directory, HASHES_NAME))
+        duplicates = {os.path.basename(representative): [os.path.basename(path) for path in paths]
+                      for representative, paths in clusters.items() if paths}
+        write_json_atomic(os.path.join(label_directory, DUPLICATES_NAME),
+                          {"method": self.method, "hash_size": self.hash_size, "threshold": self.threshold,
+                           "clusters": duplicates}, fsync=False)
+        return clusters
+
+
+class BackgroundDeduplication(BackgroundTask):
+    # the result are the clusters of Deduplicator.deduplicate
+    def __init__(self, deduplicator, image_paths, label_directory):
+        super().__init__(self.deduplicate, deduplicator, image_paths, label_directory)
+
+    @staticmethod
+    def deduplicate(deduplicator, image_paths, label_directory):
+        try:
+            return deduplicator.deduplicate(image_paths, label_directory)
+        except OSError as error:
+            print(f'Could not find duplicates in {label_directory}: {error}')
+            return {image_path: [] for image_path in image_paths}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-identical frames of an image directory, so that only '
+                                                 'one frame per cluster has to be labeled.')
+    parser.add_argument('--images', required=True, help='Path to the image directory')
+    parser.add_argument('--recursive', action='store_true', help='Include images in subdirectories')
+    parser.add_argument('--method', default="dhash", choices=sorted(HASH_METHODS), help='Perceptual hash')
+    parser.add_argument('--hash-size', type=int, default=HASH_SIZE, help='Side length of the hash in bits')
+    parser.add_argument('--threshold', type=int, default=DUPLICATE_THRESHOLD,
+                        help='Largest Hamming distance between a duplicate and its representative')
+    parser.add_argument('--jobs', type=int, default=HASH_WORKERS, help='Number of worker threads')
+    args = parser.parse_args()
+
+    label_directory = get_label_directory(args.images)
+    os.makedirs(label_directory, exist_ok=True)
+    image_paths = list_images(args.images, args.recursive, manifest_path=get_image_manifest_path(label_directory))
+    deduplicator = Deduplicator(args.method, args.hash_size, args.threshold, args.jobs)
+    clusters = deduplicator.deduplicate(image_paths, label_directory)
+    print(f'Found {len(image_paths) - len(clusters)} duplicates in {len(image_paths)} images, '
+          f'{len(clusters)} images remain to be labeled. Duplicates written to '
+          f'{os.path.join(label_directory, DUPLICATES_NAME)}.')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from export import export_annotations, get_label_file_name, list_label_files, load_duplicates
+from label_db import LabelDatabase, get_database_path
+from label_writer import fsync_directory, write_json_atomic
+from misc.annotations import AnnotationStore
+from misc.vocabulary import Vocabulary
+from scanner import MANIFEST_NAME, list_images
+from tracking import track_bboxes
+
+LABEL_ROOT = "Labels"
+
+
+def get_label_directory(image_directory, label_root=LABEL_ROOT):
+    return os.path.join(label_root, os.path.basename(os.path.normpath(image_directory)))
+
+
+def get_image_manifest_path(label_directory):
+    return os.path.join(label_directory, MANIFEST_NAME)
+
+
+def load_label_file(label_path):
+    with open(label_path, "r") as file:
+        return json.load(file)
+
+
+class LabelingEngine:
+    def __init__(self, image_paths, label_directory, writer=None, database=None, fan_out_duplicates=False):
+        self.image_paths = list(image_paths)
+        self.label_directory = label_directory
+        self.writer = writer  # LabelWriter for asynchronous saves, None writes synchronously
+        self.database = database  # LabelDatabase that replaces the .txt files of label_directory
+        self.fan_out_duplicates = fan_out_duplicates  # only while deduplication is enabled
+        os.makedirs(self.label_directory, exist_ok=True)
+
+    @classmethod
+    def from_image_directory(cls, image_directory, label_root=LABEL_ROOT, writer=None, recursive=False,
+                             use_database=False):
+        label_directory = get_label_directory(image_directory, label_root)
+        os.makedirs(label_directory, exist_ok=True)
+        image_paths = list_images(image_directory, recursive, manifest_path=get_image_manifest_path(label_directory))
+        database = LabelDatabase(get_database_path(label_directory)) if use_database else None
+        return cls(image_paths, label_directory, writer, database)
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def close(self):
+        if self.database:
+            self.database.close()
+
+    def get_image_name(self, index):
+        return Path(self.image_paths[index]).name
+
+    def get_label_path(self, index):
+        return get_label_file_name(self.get_image_name(index), self.label_directory)
+
+    def get_label_location(self, index):
+        # where the labels of a frame are stored, for messages
+        if self.database:
+            return f'{self.database.path}:{self.get_image_name(index)}'
+        return self.get_label_path(index)
+
+    def get_loading_index(self, index, next_or_prev=0, keep_annotations=False):
+        # with "keep annotations" a frame opens with the labels of the frame it was reached from
+        return index + next_or_prev if keep_annotations else index
+
+    def get_loading_label_path(self, index, next_or_prev=0, keep_annotations=False):
+        return self.get_label_path(self.get_loading_index(index, next_or_prev, keep_annotations))
+
+    def read_labels(self, label_path):
+        data = self.writer.get_pending(label_path) if self.writer else None
+        if data is not None:
+            return data
+        if not os.path.exists(label_path):
+            return None
+        return load_label_file(label_path)
+
+    def read_frame_labels(self, index):
+        if self.database:
+            return self.database.read(self.get_image_name(index))
+        return self.read_labels(self.get_label_path(index))
+
+    def has_labels(self, index):
+        if self.database:
+            return self.database.contains(self.get_image_name(index))
+        return os.path.exists(self.get_label_path(index))
+
+    def load_annotations(self, index, next_or_prev=0, keep_annotations=False):
+        loading_index = self.get_loading_index(index, next_or_prev, keep_annotations)
+        data = self.read_frame_labels(loading_index)
+        if data is None:
+            return None, self.get_label_location(loading_index)
+        return AnnotationStore.from_odgt(data), self.get_label_location(loading_index)
+
+    def save_annotations(self, index, annotations, width, height):
+        data = annotations.to_odgt(self.get_image_name(index), width, height)
+        if self.database:
+            self.database.write(self.get_image_name(index), data)
+        else:
+            self.write_labels(self.get_label_path(index), data)
+
+    def write_labels(self, label_path, data, fsync=True):
+        if self.writer:
+            self.writer.save(label_path, data)
+        else:
+            write_json_atomic(label_path, data, fsync=fsync)
+
+    def export(self, odgt_output_path):
+        if self.database:
+            duplicates = load_duplicates(self.label_directory) if self.fan_out_duplicates else None
+            return self.database.export_odgt(odgt_output_path, duplicates)
+        if self.writer:
+            self.writer.flush()
+        total, _ = export_annotations(self.label_directory, odgt_output_path, fan_out=self.fan_out_duplicates)
+        return total
+
+    def propagate(self, start, end, overwrite=False, track=False):
+        # copies the labels of frame `start` to the frames start + 1 ... end (0-based, inclusive);
+        # with `track` every bbox follows the motion estimated between consecutive frames
+        data = self.read_frame_labels(start)
+        if data is None:
+            raise FileNotFoundError(f'No labels for {self.get_image_name(start)}')
+        annotations = AnnotationStore.from_odgt(data) if track else None
+
+        written = []  # (index, labels)
+        for index in range(start + 1, end + 1):
+            if track:
+                tracked = track_bboxes(self.image_paths[index - 1], self.image_paths[index],
+                                       annotations.get_coordinates())
+                for idx, coordinates in enumerate(tracked):
+                    annotations.move_bbox(idx, coordinates)
+
+            if not overwrite and self.has_labels(index):
+                continue
+
+            # consecutive video frames share their size, so the source frame's size is kept
+            if track:
+                frame_data = annotations.to_odgt(self.get_image_name(index), data["width"], data["height"])
+            else:
+                frame_data = dict(data, file_name=self.get_image_name(index))
+            written.append((index, frame_data))
+
+        if self.database:
+            self.database.write_many((self.get_image_name(index), frame_data) for index, frame_data in written)
+            return len(written)
+
+        for index, frame_data in written:
+            self.write_labels(self.get_label_path(index), frame_data)
+        if not self.writer and written:
+            fsync_directory(self.label_directory)
+        return len(written)
+
+
+class OdgtReview:
+    # read-only engine over an exported ODGT file, shown together with the images it was exported from
+    def __init__(self, reader, image_directory):
+        if None in reader.file_names:
+            line_number = reader.get_line_number(reader.file_names.index(None))
+            raise ValueError(f'{reader.path}:{line_number} is not an ODGT record')
+        self.reader = reader
+        self.image_paths = [os.path.join(image_directory, file_name) for file_name in reader.file_names]
+        self.label_directory = ""
+        self.database = None
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def close(self):
+        self.reader.close()
+
+    def get_image_name(self, index):
+        return Path(self.image_paths[index]).name
+
+    def get_label_location(self, index):
+        return f'{self.reader.path}:{index + 1}'
+
+    def load_annotations(self, index, next_or_prev=0, keep_annotations=False):  # noqa
+        return AnnotationStore.from_odgt(self.reader[index]), self.get_label_location(index)
+
+    def save_annotations(self, index, annotations, width, height):
+        pass
+
+    def export(self, odgt_output_path):
+        shutil.copyfile(self.reader.path, odgt_output_path)
+        return len(self.reader)
+
+
+def validate_label_directory(label_directory, vocabulary=None):
+    vocabulary = vocabulary or Vocabulary()
+    problems = []
+
+    for name in sorted(list_label_files(label_directory)):
+        try:
+            data = load_label_file(os.path.join(label_directory, name))
+            annotations = AnnotationStore.from_odgt(data)
+        except (ValueError, KeyError, TypeError) as error:
+            problems.append((name, f'unreadable label file: {error!r}'))
+            continue
+
+        for tag in vocabulary.get_unknown_objects(bbox.tag for bbox in annotations.bboxes):
+            problems.append((name, f"unknown object '{tag}'"))
+        for tag in vocabulary.get_unknown_interactions(hoi.interaction for hoi in annotations.interactions):
+            problems.append((name, f"unknown interaction '{tag}'"))
+
+        for hoi in annotations.interactions:
+            if not (0 <= hoi.subject_id < len(annotations) and 0 <= hoi.object_id < len(annotations)):
+                problems.append((name, f'interaction {hoi.to_odgt()} refers to a missing bbox'))
+            elif annotations.bboxes[hoi.subject_id].label_type != "person":
+                problems.append((name, f'interaction {hoi.to_odgt()} has no person as subject'))
+
+    return problems
+
+
+def merge_label_directories(source_directories, target_directory, prefer="last"):
+    # copies all label files into target_directory; for files present in several sources `prefer` decides
+    os.makedirs(target_directory, exist_ok=True)
+    sources = source_directories if prefer == "last" else list(reversed(source_directories))
+
+    chosen = {}
+    for source_directory in sources:
+        for name in list_label_files(source_directory):
+            chosen[name] = os.path.join(source_directory, name)
+
+    for name, source_path in chosen.items():
+        shutil.copy2(source_path, os.path.join(target_directory, name))
+    return len(chosen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless batch operations on HOI label directories.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    propagate_parser = subparsers.add_parser('propagate', help='Copy the labels of one frame to following frames')
+    propagate_parser.add_argument('--images', required=True, help='Path to the image directory')
+    propagate_parser.add_argument('--labels', help='Path to the label directory (default: Labels/<image dir>)')
+    propagate_parser.add_argument('--start', type=int, required=True, help='Frame to copy from (1-based)')
+    propagate_parser.add_argument('--end', type=int, required=True, help='Last frame to copy to (1-based)')
+    propagate_parser.add_argument('--overwrite', action='store_true', help='Replace existing labels')
+    propagate_parser.add_argument('--recursive', action='store_true', help='Include images in subdirectories')
+    propagate_parser.add_argument('--track', action='store_true', help='Move the bboxes along with the image content')
+    propagate_parser.add_argument('--database', action='store_true',
+                                  help='Use the label database <label dir>.sqlite instead of .txt files')
+
+    validate_parser = subparsers.add_parser('validate', help='Check label files for errors')
+    validate_parser.add_argument('--labels', required=True, help='Path to the label directory')
+
+    merge_parser = subparsers.add_parser('merge', help='Merge several label directories into one')
+    merge_parser.add_argument('--output', required=True, help='Path to the merged label directory')
+    merge_parser.add_argument('--prefer', choices=['first', 'last'], default='last',
+                              help='Which source wins when a frame is labeled in several directories')
+    merge_parser.add_argument('sources', nargs='+', help='Label directories to merge')
+
+    export_parser = subparsers.add_parser('export', help='Export a label directory to an ODGT file')
+    export_parser.add_argument('--labels', required=True, help='Path to the label directory')
+    export_parser.add_argument('--output', required=True, help='Path to the output ODGT file')
+    export_parser.add_argument('--duplicates', action='store_true',
+                               help='Export unlabeled duplicates found by deduplication.py with the labels of their '
+                                    'representative')
+
+    args = parser.parse_args()
+
+    if args.command == 'propagate':
+        label_directory = args.labels or get_label_directory(args.images)
+        os.makedirs(label_directory, exist_ok=True)
+        image_paths = list_images(args.images, args.recursive, manifest_path=get_image_manifest_path(label_directory))
+        database = LabelDatabase(get_database_path(label_directory)) if args.database else None
+        engine = LabelingEngine(image_paths, label_directory, database=database)
+        written = engine.propagate(args.start - 1, min(args.end, len(engine)) - 1, overwrite=args.overwrite,
+                                   track=args.track)
+        print(f'Wrote labels for {written} frames.')
+    elif args.command == 'validate':
+        problems = validate_label_directory(args.labels)
+        for name, problem in problems:
+            print(f'{name}: {problem}')
+        print(f'{len(problems)} problems found.')
+        sys.exit(1 if problems else 0)
+    elif args.command == 'merge':
+        merged = merge_label_directories(args.sources, args.output, prefer=args.prefer)
+        print(f'Merged {merged} label files into {args.output}.')
+    elif args.command == 'export':
+        total, _ = export_annotations(args.labels, args.output, fan_out=args.duplicates)
+        print(f'Exported {total} frames.')
+
+
+if __name__ == "__main__":
+    main()
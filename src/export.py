@@ -2,19 +2,162 @@
 #
 # SPDX-License-Identifier: MIT
 
+import argparse
+import json
 import os
-import glob
+from concurrent.futures import ThreadPoolExecutor
 
-def export_annotations(label_dir_path, odgt_output_path):
-    txt_files = glob.glob(os.path.join(label_dir_path, "*.txt"))
-    txt_files.sort()
+EXPORT_WORKERS = 8
+EXPORT_BATCH_SIZE = 512  # number of label files read ahead of the writer
+DUPLICATES_NAME = ".duplicates.json"  # near-identical frames found by deduplication.py
 
-    annotations = []
-    for txt_file in txt_files:
-        with open(txt_file, 'r') as file:
-            anno = file.read()
-            annotations.append(anno)
 
-    with open(odgt_output_path, 'w') as file:
-        for annotation in annotations:
-            file.write(annotation + '\n')
+def get_manifest_path(odgt_output_path):
+    return odgt_output_path + ".manifest"
+
+
+def get_label_name(image_name):
+    return os.path.splitext(image_name)[0] + '.txt'
+
+
+def get_label_file_name(image_name, label_directory):
+    return os.path.join(label_directory, get_label_name(image_name))
+
+
+def load_duplicates(label_dir_path):
+    # image name of a representative -> image names of its duplicates
+    try:
+        with open(os.path.join(label_dir_path, DUPLICATES_NAME), 'r') as file:
+            return json.load(file)["clusters"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def get_fanned_out(label_dir_path, label_files):
+    # label file name of an unlabeled duplicate -> (label file name of its representative, image name);
+    # a duplicate that has its own labels keeps them
+    fanned_out = {}
+    for representative, duplicates in load_duplicates(label_dir_path).items():
+        source = get_label_name(representative)
+        if source not in label_files:
+            continue
+        for duplicate in duplicates:
+            if get_label_name(duplicate) not in label_files:
+                fanned_out[get_label_name(duplicate)] = (source, duplicate)
+    return fanned_out
+
+
+def rename_record(line, file_name):
+    data = json.loads(line)
+    data["file_name"] = file_name
+    return json.dumps(data).encode()
+
+
+def read_label_file(txt_file):
+    with open(txt_file, 'rb') as file:
+        return file.read()
+
+
+def list_label_files(label_dir_path):
+    entries = {}
+    with os.scandir(label_dir_path) as iterator:
+        for entry in iterator:
+            if entry.name.endswith(".txt") and not entry.name.startswith(".") and entry.is_file():
+                stat = entry.stat()
+                entries[entry.name] = [stat.st_mtime_ns, stat.st_size]
+    return entries
+
+
+def load_manifest(odgt_output_path):
+    # previous export: label file name -> [mtime_ns, size, offset in odgt, length in odgt], followed by the label
+    # file name of the representative for a fanned-out duplicate
+    manifest_path = get_manifest_path(odgt_output_path)
+    if not os.path.exists(manifest_path) or not os.path.exists(odgt_output_path):
+        return {}
+
+    try:
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get("odgt_size") != os.path.getsize(odgt_output_path):
+        return {}
+    return manifest["files"]
+
+
+def export_annotations(label_dir_path, odgt_output_path, workers=EXPORT_WORKERS, incremental=True, fan_out=False):
+    # fan_out: unlabeled duplicates found by deduplication.py are exported with the labels of their representative
+    label_files = list_label_files(label_dir_path)
+    fanned_out = get_fanned_out(label_dir_path, label_files) if fan_out else {}
+    previous = load_manifest(odgt_output_path) if incremental else {}
+
+    def get_source(name):
+        return fanned_out[name][0] if name in fanned_out else name
+
+    def get_state(name):
+        # a fanned-out duplicate is exported again when the labels of its representative change;
+        # the name of the representative follows the offset and length in its manifest entry
+        if name in fanned_out:
+            return label_files[get_source(name)], [get_source(name)]
+        return label_files[name], []
+
+    def is_unchanged(name):
+        stat, source = get_state(name)
+        return name in previous and previous[name][:2] == stat and previous[name][4:] == source
+
+    names = sorted(label_files.keys() | fanned_out.keys())
+    temp_path = odgt_output_path + ".tmp"
+    manifest = {}
+    offset = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            open(temp_path, 'wb') as output, \
+            open(odgt_output_path if previous else os.devnull, 'rb') as previous_output:
+        for start in range(0, len(names), EXPORT_BATCH_SIZE):
+            batch = names[start:start + EXPORT_BATCH_SIZE]
+            changed = [name for name in batch if not is_unchanged(name)]
+            annotations = dict(zip(changed, executor.map(
+                read_label_file, [os.path.join(label_dir_path, get_source(name)) for name in changed]
+            )))
+
+            for name in batch:
+                if name in annotations and name in fanned_out:
+                    line = rename_record(annotations[name], fanned_out[name][1]) + b'\n'
+                elif name in annotations:
+                    line = annotations[name] + b'\n'
+                else:
+                    # splice the unchanged record from the previous export
+                    previous_output.seek(previous[name][2])
+                    line = previous_output.read(previous[name][3])
+
+                output.write(line)
+                stat, source = get_state(name)
+                manifest[name] = stat + [offset, len(line)] + source
+                offset += len(line)
+
+    os.replace(temp_path, odgt_output_path)
+    with open(get_manifest_path(odgt_output_path), 'w') as file:
+        json.dump({"odgt_size": os.path.getsize(odgt_output_path), "files": manifest}, file)
+
+    return len(names), len(names) - sum(is_unchanged(name) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a label directory to an ODGT file.')
+    parser.add_argument('--labels', required=True, help='Path to the label directory')
+    parser.add_argument('--output', required=True, help='Path to the output ODGT file')
+    parser.add_argument('--jobs', type=int, default=EXPORT_WORKERS, help='Number of reader threads')
+    parser.add_argument('--full', action='store_true', help='Reread all label files instead of only changed ones')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='Export unlabeled duplicates found by deduplication.py with the labels of their '
+                             'representative')
+    args = parser.parse_args()
+
+    total, reread = export_annotations(args.labels, args.output, workers=args.jobs, incremental=not args.full,
+                                       fan_out=args.duplicates)
+    print(f'Exported {total} frames ({reread} read from label files).')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+from collections import deque
+
+HISTORY_LIMIT = 500
+
+# Every command stores only the change it made. The editor passed to undo/redo provides
+# insert_bbox, remove_bbox, move_bbox, insert_interaction and remove_interaction, which update
+# the annotations, the spatial index and the affected canvas items.
+
+
+class AddBBox:
+    __slots__ = ('idx', 'bbox')
+
+    def __init__(self, idx, bbox):
+        self.idx = idx
+        self.bbox = bbox
+
+    def undo(self, editor):
+        editor.remove_bbox(self.idx)
+
+    def redo(self, editor):
+        editor.insert_bbox(self.idx, self.bbox)
+
+
+class MoveBBox:
+    __slots__ = ('idx', 'old_coordinates', 'new_coordinates')
+
+    def __init__(self, idx, old_coordinates, new_coordinates):
+        self.idx = idx
+        self.old_coordinates = old_coordinates
+        self.new_coordinates = new_coordinates
+
+    def undo(self, editor):
+        editor.move_bbox(self.idx, self.old_coordinates)
+
+    def redo(self, editor):
+        editor.move_bbox(self.idx, self.new_coordinates)
+
+
+class DeleteBBox:
+    __slots__ = ('idx', 'bbox', 'interactions')
+
+    def __init__(self, idx, bbox, interactions):
+        self.idx = idx
+        self.bbox = bbox
+        self.interactions = interactions  # [(interaction index, interaction)] of the bbox, in removal order
+
+    def undo(self, editor):
+        editor.insert_bbox(self.idx, self.bbox)
+        for interaction_index, interaction in reversed(self.interactions):
+            editor.insert_interaction(interaction_index, interaction)
+
+    def redo(self, editor):
+        for interaction_index, _ in self.interactions:
+            editor.remove_interaction(interaction_index)
+        editor.remove_bbox(self.idx)
+
+
+class AddInteraction:
+    __slots__ = ('idx', 'interaction')
+
+    def __init__(self, idx, interaction):
+        self.idx = idx
+        self.interaction = interaction
+
+    def undo(self, editor):
+        editor.remove_interaction(self.idx)
+
+    def redo(self, editor):
+        editor.insert_interaction(self.idx, self.interaction)
+
+
+class DeleteInteraction:
+    __slots__ = ('idx', 'interaction')
+
+    def __init__(self, idx, interaction):
+        self.idx = idx
+        self.interaction = interaction
+
+    def undo(self, editor):
+        editor.insert_interaction(self.idx, self.interaction)
+
+    def redo(self, editor):
+        editor.remove_interaction(self.idx)
+
+
+class CommandHistory:
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = deque(maxlen=limit)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def execute(self, command, editor):
+        command.redo(editor)
+        self.push(command)
+
+    def push(self, command):
+        # for changes that were already applied, e.g. a finished drag
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+
+    def undo(self, editor):
+        if not self.undo_stack:
+            return False
+        command = self.undo_stack.pop()
+        command.undo(editor)
+        self.redo_stack.append(command)
+        return True
+
+    def redo(self, editor):
+        if not self.redo_stack:
+            return False
+        command = self.redo_stack.pop()
+        command.redo(editor)
+        self.undo_stack.append(command)
+        return True
@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+PREFETCH_NEXT = 3
+PREFETCH_PREV = 1
+CACHE_MEMORY_BUDGET = 1024 * 1024 * 1024  # bytes of decoded pixel data
+
+
+def decode_image(image_path):
+    image = Image.open(image_path)
+    image.load()
+    return image
+
+
+def get_image_size_in_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+class ImagePrefetcher:
+    def __init__(self, prefetch_next=PREFETCH_NEXT, prefetch_prev=PREFETCH_PREV, memory_budget=CACHE_MEMORY_BUDGET):
+        self.prefetch_next = prefetch_next
+        self.prefetch_prev = prefetch_prev
+        self.memory_budget = memory_budget
+
+        self.image_paths = []
+        self.cache = OrderedDict()  # image_path -> decoded image, least recently used first
+        self.cache_size = 0
+        self.queue = []  # image paths waiting to be decoded, most urgent first
+        self.decoding_path = None
+        self.generation = 0
+
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def set_image_paths(self, image_paths, keep_cache=False):
+        # decoded images are keyed by path, so they stay valid when the same directory is only re-sorted or extended
+        with self.condition:
+            self.image_paths = list(image_paths)
+            self.queue = []
+            if not keep_cache:
+                self.generation += 1
+                self.cache.clear()
+                self.cache_size = 0
+
+    def get(self, index):
+        image_path = self.image_paths[index]
+
+        with self.condition:
+            self.condition.wait_for(lambda: self.decoding_path != image_path)
+            image = self.cache.get(image_path)
+            if image is not None:
+                self.cache.move_to_end(image_path)
+
+        if image is None:
+            image = decode_image(image_path)
+            with self.condition:
+                self.add_to_cache(image_path, image)
+
+        self.prefetch(index)
+        return image
+
+    def get_cached(self, index):
+        # does not wait for the image to be decoded
+        image_path = self.image_paths[index]
+        with self.condition:
+            image = self.cache.get(image_path)
+            if image is not None:
+                self.cache.move_to_end(image_path)
+            return image
+
+    def is_pending(self, index):
+        image_path = self.image_paths[index]
+        with self.condition:
+            return image_path == self.decoding_path or image_path in self.queue
+
+    def request(self, index):
+        # decodes the image in the background, before the images around it
+        self.prefetch(index, include_index=True)
+
+    def prefetch(self, index, include_index=False):
+        following = [index + offset for offset in range(1, self.prefetch_next + 1)]
+        preceding = [index - offset for offset in range(1, self.prefetch_prev + 1)]
+
+        # alternate between directions so that the next image is always decoded first
+        order = [index] if include_index else []
+        for i in range(max(len(following), len(preceding))):
+            order.extend(candidates[i] for candidates in (following, preceding) if i < len(candidates))
+
+        with self.condition:
+            self.queue = [
+                self.image_paths[i] for i in order
+                if 0 <= i < len(self.image_paths) and self.image_paths[i] not in self.cache
+            ]
+            self.condition.notify_all()
+
+    def add_to_cache(self, image_path, image):
+        if image_path in self.cache:
+            return
+
+        self.cache[image_path] = image
+        self.cache_size += get_image_size_in_bytes(image)
+
+        while self.cache_size > self.memory_budget and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_size -= get_image_size_in_bytes(evicted)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue)
+                image_path = self.queue.pop(0)
+                if image_path in self.cache:
+                    continue
+                self.decoding_path = image_path
+                generation = self.generation
+
+            try:
+                image = decode_image(image_path)
+            except OSError as error:
+                print(f'Could not prefetch {image_path}: {error}')
+                image = None
+
+            with self.condition:
+                if image is not None and generation == self.generation:
+                    self.add_to_cache(image_path, image)
+                self.decoding_path = None
+                self.condition.notify_all()
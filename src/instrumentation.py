@@ -0,0 +1,122 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+TRACE_ROOT = "Traces"
+LATENCY_WINDOW = 1000  # latest durations per action used for the percentiles
+MAX_TRACE_EVENTS = 1000000
+TOP_ALLOCATIONS = 20
+
+# event handlers and I/O paths of LabelTool; the label pickers wait for the user in show(), so only their
+# filtering is timed
+TOOL_METHODS = (
+    "mouse_click", "mouse_move", "process_motion", "mouse_release", "cancel_bbox", "load_image", "save_image",
+    "prev_image", "next_image", "reset", "undo", "redo", "delete_at_cursor", "zoom", "update_canvas", "export",
+    "load_directory", "load_odgt", "draw_annotations", "redraw_annotations", "accept_suggestions"
+)
+ENGINE_METHODS = ("load_annotations", "save_annotations", "export")
+PREFETCHER_METHODS = ("get",)
+PICKER_METHODS = ("apply_filter", "render")
+
+
+def get_percentile(sorted_values, percentile):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))]
+
+
+class Instrumentation:
+    def __init__(self, trace_directory=TRACE_ROOT, trace_memory=True):
+        self.trace_path = os.path.join(trace_directory, time.strftime('session-%Y%m%d-%H%M%S.json'))
+        self.trace_memory = trace_memory
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events = []  # Chrome trace events
+        self.dropped_events = 0
+        self.durations = {}  # action -> latest durations in milliseconds
+        self.depth = 0  # nesting of instrumented calls, memory is sampled after the outermost one
+        if trace_memory:
+            tracemalloc.start()
+
+    def instrument(self, target, names, prefix=""):
+        # the wrappers are stored on the instance, so this has to run before its methods are bound to events
+        for name in names:
+            setattr(target, name, self.wrap(prefix + name, getattr(target, name)))
+
+    def wrap(self, action, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.depth += 1
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = time.perf_counter_ns()
+                self.depth -= 1
+                self.record(action, start, end)
+        return wrapper
+
+    def add_event(self, event):
+        if len(self.events) < MAX_TRACE_EVENTS:
+            self.events.append(event)
+        else:
+            self.dropped_events += 1
+
+    def record(self, action, start, end):
+        self.durations.setdefault(action, deque(maxlen=LATENCY_WINDOW)).append((end - start) / 1e6)
+        self.add_event({"name": action, "cat": action.split('.')[0] if '.' in action else "tool", "ph": "X",
+                        "ts": (start - self.origin) / 1e3, "dur": (end - start) / 1e3, "pid": self.pid,
+                        "tid": threading.get_ident()})
+
+        if self.trace_memory and self.depth == 0:
+            # traced Python memory after the action and its peak during the action
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            self.add_event({"name": "memory", "ph": "C", "ts": (end - self.origin) / 1e3, "pid": self.pid,
+                            "args": {"current_bytes": current, "peak_bytes": peak}})
+
+    def get_summary(self):
+        # action -> (count, p50, p99) in milliseconds
+        summary = {}
+        for action, durations in self.durations.items():
+            values = sorted(durations)
+            summary[action] = (len(values), get_percentile(values, 50), get_percentile(values, 99))
+        return summary
+
+    def format_summary(self, limit=None):
+        # the slowest actions first
+        rows = sorted(self.get_summary().items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        width = max((len(action) for action, _ in rows), default=0)
+        return '\n'.join(f'{action:<{width}}  p50 {p50:7.1f}  p99 {p99:7.1f} ms'
+                         for action, (_, p50, p99) in rows)
+
+    def get_top_allocations(self):
+        statistics = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+        return [{"location": str(statistic.traceback[0]), "size_bytes": statistic.size, "count": statistic.count}
+                for statistic in statistics]
+
+    def write_trace(self):
+        metadata = {"dropped_events": self.dropped_events,
+                    "latency_ms": {action: {"count": count, "p50": p50, "p99": p99}
+                                   for action, (count, p50, p99) in self.get_summary().items()}}
+        if self.trace_memory:
+            metadata["top_allocations"] = self.get_top_allocations()
+
+        os.makedirs(os.path.dirname(self.trace_path), exist_ok=True)
+        with open(self.trace_path, 'w') as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "metadata": metadata}, file)
+        return self.trace_path
+
+    def close(self):
+        try:
+            print(f'Trace written to {self.write_trace()}.')
+        except OSError as error:
+            print(f'Could not write trace {self.trace_path}: {error}')
+        if self.trace_memory:
+            tracemalloc.stop()
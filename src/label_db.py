@@ -0,0 +1,236 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import heapq
+import json
+import os
+import sqlite3
+
+from export import get_label_file_name, list_label_files, read_label_file
+from label_writer import fsync_directory, write_json_atomic
+
+DATABASE_SUFFIX = ".sqlite"
+IMPORT_BATCH_SIZE = 1000  # label files written per transaction when importing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL UNIQUE,
+    height INTEGER NOT NULL,
+    width INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boxes (
+    frame_id INTEGER NOT NULL REFERENCES frames(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    PRIMARY KEY (frame_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hois (
+    frame_id INTEGER NOT NULL REFERENCES frames(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    object_id INTEGER NOT NULL,
+    interaction TEXT NOT NULL,
+    subject_id INTEGER NOT NULL,
+    PRIMARY KEY (frame_id, position)
+) WITHOUT ROWID;
+"""
+
+
+def get_database_path(label_directory):
+    # Labels/<image dir>.sqlite next to the label directory of the same images
+    return os.path.normpath(label_directory) + DATABASE_SUFFIX
+
+
+def to_odgt(file_name, height, width, boxes, hois):
+    # same key order as the label files written by AnnotationStore.to_odgt
+    return {
+        "file_name": file_name,
+        "height": height,
+        "width": width,
+        "gtboxes": [{"tag": tag, "box": [x, y, box_width, box_height]} for tag, x, y, box_width, box_height in boxes],
+        "hoi": [{"object_id": object_id, "interaction": interaction, "subject_id": subject_id}
+                for object_id, interaction, subject_id in hois]
+    }
+
+
+class LabelDatabase:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # a WAL commit survives application crashes
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def get_frame_id(self, file_name):
+        row = self.connection.execute("SELECT id FROM frames WHERE file_name = ?", (file_name,)).fetchone()
+        return row[0] if row else None
+
+    def contains(self, file_name):
+        return self.get_frame_id(file_name) is not None
+
+    def read(self, file_name):
+        row = self.connection.execute(
+            "SELECT id, height, width FROM frames WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        frame_id, height, width = row
+        boxes = self.connection.execute(
+            "SELECT tag, x, y, width, height FROM boxes WHERE frame_id = ? ORDER BY position", (frame_id,)
+        )
+        hois = self.connection.execute(
+            "SELECT object_id, interaction, subject_id FROM hois WHERE frame_id = ? ORDER BY position", (frame_id,)
+        )
+        return to_odgt(file_name, height, width, boxes, hois)
+
+    def write(self, file_name, data):
+        self.write_many([(file_name, data)])
+
+    def write_many(self, records):
+        # all records are written in one transaction, so a frame is never stored half
+        with self.connection:
+            for file_name, data in records:
+                self.insert_frame(file_name, data)
+
+    def insert_frame(self, file_name, data):
+        frame_id = self.get_frame_id(file_name)
+        if frame_id is None:
+            frame_id = self.connection.execute(
+                "INSERT INTO frames (file_name, height, width) VALUES (?, ?, ?)",
+                (file_name, data["height"], data["width"])
+            ).lastrowid
+        else:
+            self.connection.execute("UPDATE frames SET height = ?, width = ? WHERE id = ?",
+                                    (data["height"], data["width"], frame_id))
+            self.connection.execute("DELETE FROM boxes WHERE frame_id = ?", (frame_id,))
+            self.connection.execute("DELETE FROM hois WHERE frame_id = ?", (frame_id,))
+
+        self.connection.executemany(
+            "INSERT INTO boxes (frame_id, position, tag, x, y, width, height) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(frame_id, position, gtbox["tag"], *gtbox["box"]) for position, gtbox in enumerate(data["gtboxes"])]
+        )
+        self.connection.executemany(
+            "INSERT INTO hois (frame_id, position, object_id, interaction, subject_id) VALUES (?, ?, ?, ?, ?)",
+            [(frame_id, position, hoi["object_id"], hoi["interaction"], hoi["subject_id"])
+             for position, hoi in enumerate(data["hoi"])]
+        )
+
+    def iter_records(self):
+        # frames, boxes and hois are each read in one pass in file name order and merged
+        frames = self.connection.execute("SELECT id, file_name, height, width FROM frames ORDER BY file_name")
+        boxes = self.connection.execute(
+            "SELECT b.frame_id, b.tag, b.x, b.y, b.width, b.height "
+            "FROM frames f JOIN boxes b ON b.frame_id = f.id ORDER BY f.file_name, b.position"
+        )
+        hois = self.connection.execute(
+            "SELECT h.frame_id, h.object_id, h.interaction, h.subject_id "
+            "FROM frames f JOIN hois h ON h.frame_id = f.id ORDER BY f.file_name, h.position"
+        )
+
+        next_box = next(boxes, None)
+        next_hoi = next(hois, None)
+        for frame_id, file_name, height, width in frames:
+            frame_boxes = []
+            while next_box is not None and next_box[0] == frame_id:
+                frame_boxes.append(next_box[1:])
+                next_box = next(boxes, None)
+
+            frame_hois = []
+            while next_hoi is not None and next_hoi[0] == frame_id:
+                frame_hois.append(next_hoi[1:])
+                next_hoi = next(hois, None)
+
+            yield to_odgt(file_name, height, width, frame_boxes, frame_hois)
+
+    def iter_fanned_out(self, duplicates):
+        # records of the duplicates without labels of their own, with the labels of their representative,
+        # in file name order; a duplicate may sort before its representative, so these are read separately
+        representative_data = None
+        for duplicate, representative in sorted((duplicate, representative)
+                                                for representative, names in duplicates.items() for duplicate in names):
+            if self.contains(duplicate):
+                continue
+            if representative_data is None or representative_data["file_name"] != representative:
+                representative_data = self.read(representative)
+            if representative_data is not None:
+                yield dict(representative_data, file_name=duplicate)
+
+    def export_odgt(self, odgt_output_path, duplicates=None):
+        # duplicates: image name of a representative -> image names of the duplicates that receive its labels
+        # unless they have their own; the records are in the same order as the export of a label directory
+        records = heapq.merge(self.iter_records(), self.iter_fanned_out(duplicates or {}),
+                              key=lambda data: data["file_name"])
+        temp_path = odgt_output_path + ".tmp"
+        total = 0
+        with open(temp_path, 'w', encoding="utf-8") as output:
+            for data in records:
+                output.write(json.dumps(data) + '\n')
+                total += 1
+        os.replace(temp_path, odgt_output_path)
+        return total
+
+    def import_label_directory(self, label_directory):
+        names = sorted(list_label_files(label_directory))
+        for start in range(0, len(names), IMPORT_BATCH_SIZE):
+            records = []
+            for name in names[start:start + IMPORT_BATCH_SIZE]:
+                data = json.loads(read_label_file(os.path.join(label_directory, name)))
+                records.append((data["file_name"], data))
+            self.write_many(records)
+        return len(names)
+
+    def export_label_directory(self, label_directory):
+        # writes the .txt layout of the GUI: one label file per frame, named after the image
+        os.makedirs(label_directory, exist_ok=True)
+        total = 0
+        for data in self.iter_records():
+            write_json_atomic(get_label_file_name(data["file_name"], label_directory), data)
+            total += 1
+        fsync_directory(label_directory)
+        return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert between label directories and a label database.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Copy the .txt files of a label directory into a database')
+    import_parser.add_argument('--labels', required=True, help='Path to the label directory')
+    import_parser.add_argument('--database', help='Path to the database (default: <label dir>.sqlite)')
+
+    dump_parser = subparsers.add_parser('dump', help='Write the frames of a database as .txt label files')
+    dump_parser.add_argument('--database', required=True, help='Path to the database')
+    dump_parser.add_argument('--labels', required=True, help='Path to the label directory')
+
+    export_parser = subparsers.add_parser('export', help='Export a database to an ODGT file')
+    export_parser.add_argument('--database', required=True, help='Path to the database')
+    export_parser.add_argument('--output', required=True, help='Path to the output ODGT file')
+
+    args = parser.parse_args()
+
+    database = LabelDatabase(args.database or get_database_path(args.labels))
+    if args.command == 'import':
+        print(f'Imported {database.import_label_directory(args.labels)} label files into {database.path}.')
+    elif args.command == 'dump':
+        print(f'Wrote {database.export_label_directory(args.labels)} label files to {args.labels}.')
+    elif args.command == 'export':
+        print(f'Exported {database.export_odgt(args.output)} frames.')
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
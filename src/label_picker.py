@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import customtkinter
+
+VISIBLE_ROWS = 10
+ROW_HEIGHT = 26
+RECENT_LIMIT = 8
+WHEEL_ROWS = 3
+
+
+def get_words(text):
+    return text.lower().replace('_', ' ').split()
+
+
+class PrefixIndex:
+    def __init__(self, options):
+        self.options = list(options)
+        self.prefixes = {}  # prefix of a word -> positions of the options that contain such a word
+        for position, option in enumerate(self.options):
+            for word in get_words(option):
+                for length in range(1, len(word) + 1):
+                    self.prefixes.setdefault(word[:length], set()).add(position)
+
+    def search(self, text):
+        # options in which every word of the text starts a word, e.g. "ph ce" matches "cell phone"
+        matches = None
+        for word in get_words(text):
+            positions = self.prefixes.get(word, set())
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return set()
+        return set(range(len(self.options))) if matches is None else matches
+
+
+class LabelPicker:
+    # A modal window that is created once and only shown and hidden afterwards. It renders a fixed number of
+    # rows that are filled with the part of the filtered options that is scrolled into view.
+    def __init__(self, master, title, prompt, options, allow_cancel=False, visible_rows=VISIBLE_ROWS):
+        self.index = PrefixIndex(options)
+        self.allow_cancel = allow_cancel
+        self.visible_rows = visible_rows
+        self.recent = []  # positions of the chosen options, most recent first
+        self.matches = []  # positions of the options matching the filter, in display order
+        self.first_row = 0
+        self.selected = None
+        self.result = ""
+        self.row_states = [None] * visible_rows  # last (text, selected) of every row, to skip unchanged rows
+        self.selected_color = customtkinter.ThemeManager.theme["CTkButton"]["fg_color"]
+
+        self.window = customtkinter.CTkToplevel(master)
+        self.window.withdraw()
+        self.window.title(title)
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.done_var = customtkinter.BooleanVar(master=self.window)
+
+        customtkinter.CTkLabel(self.window, text=prompt).pack(pady=(10, 0))
+        self.filter_var = customtkinter.StringVar(master=self.window)
+        self.filter_var.trace_add("write", lambda *args: self.apply_filter())
+        self.entry = customtkinter.CTkEntry(self.window, textvariable=self.filter_var, width=180)
+        self.entry.pack(padx=10, pady=10)
+
+        list_frame = customtkinter.CTkFrame(self.window, fg_color="transparent")
+        list_frame.pack(fill="both", expand=True, padx=10)
+        self.scrollbar = customtkinter.CTkScrollbar(list_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.rows = []
+        for row in range(visible_rows):
+            button = customtkinter.CTkButton(list_frame, text="", anchor="w", width=160, height=ROW_HEIGHT,
+                                             fg_color="transparent", text_color=("gray10", "gray90"),
+                                             command=lambda row=row: self.select_row(row))
+            button.bind("<Double-Button-1>", lambda event, row=row: self.confirm_row(row))
+            button.pack(fill="x", pady=1)
+            self.rows.append(button)
+
+        self.ok_button = customtkinter.CTkButton(self.window, text="OK", state="disabled", command=self.confirm)
+        self.ok_button.pack(pady=10)
+
+        self.window.bind("<Return>", lambda event: self.confirm())
+        self.window.bind("<Escape>", lambda event: self.cancel())
+        self.window.bind("<Up>", lambda event: self.move_selection(-1))
+        self.window.bind("<Down>", lambda event: self.move_selection(1))
+        self.window.bind("<Prior>", lambda event: self.move_selection(-visible_rows))
+        self.window.bind("<Next>", lambda event: self.move_selection(visible_rows))
+        self.window.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.window.bind("<Button-4>", lambda event: self.scroll_to(self.first_row - WHEEL_ROWS))
+        self.window.bind("<Button-5>", lambda event: self.scroll_to(self.first_row + WHEEL_ROWS))
+
+    def show(self):
+        # returns the chosen option, or "" if the picker was closed
+        self.result = ""
+        self.filter_var.set("")
+        self.apply_filter()
+
+        self.window.deiconify()
+        self.window.lift()
+        self.window.update_idletasks()
+        self.window.grab_set()
+        self.entry.focus_set()
+        self.window.wait_variable(self.done_var)
+
+        self.window.grab_release()
+        self.window.withdraw()
+        return self.result
+
+    def get_ordered(self, positions):
+        recent = [position for position in self.recent if position in positions]
+        recent_positions = set(recent)
+        return recent + [position for position in sorted(positions) if position not in recent_positions]
+
+    def apply_filter(self):
+        self.matches = self.get_ordered(self.index.search(self.filter_var.get()))
+        # the first match is preselected, so that typing a prefix and pressing Return is enough
+        self.selected = self.matches[0] if self.matches and (self.filter_var.get() or self.recent) else None
+        self.first_row = 0
+        self.render()
+
+    def render(self):
+        selected_color = self.selected_color
+        for row, button in enumerate(self.rows):
+            match_index = self.first_row + row
+            if match_index < len(self.matches):
+                position = self.matches[match_index]
+                state = (self.index.options[position], position == self.selected)
+            else:
+                state = ("", False)
+            if state == self.row_states[row]:
+                continue
+
+            self.row_states[row] = state
+            text, selected = state
+            button.configure(text=text, state="normal" if text else "disabled",
+                             fg_color=selected_color if selected else "transparent")
+
+        total = len(self.matches)
+        if total:
+            self.scrollbar.set(self.first_row / total, min(total, self.first_row + self.visible_rows) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.ok_button.configure(state="disabled" if self.selected is None else "normal")
+
+    def scroll_to(self, first_row):
+        first_row = max(0, min(first_row, len(self.matches) - self.visible_rows))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.render()
+
+    def on_scrollbar(self, command, value, unit=None):
+        if command == "moveto":
+            self.scroll_to(round(float(value) * len(self.matches)))
+        elif command == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.first_row + int(value) * step)
+
+    def on_mouse_wheel(self, event):
+        self.scroll_to(self.first_row + (WHEEL_ROWS if event.delta < 0 else -WHEEL_ROWS))
+
+    def move_selection(self, step):
+        if not self.matches:
+            return
+        match_index = self.matches.index(self.selected) + step if self.selected in self.matches else 0
+        match_index = max(0, min(match_index, len(self.matches) - 1))
+        self.selected = self.matches[match_index]
+
+        if match_index < self.first_row:
+            self.first_row = match_index
+        elif match_index >= self.first_row + self.visible_rows:
+            self.first_row = match_index - self.visible_rows + 1
+        self.render()
+
+    def select_row(self, row):
+        if self.first_row + row < len(self.matches):
+            self.selected = self.matches[self.first_row + row]
+            self.render()
+
+    def confirm_row(self, row):
+        self.select_row(row)
+        self.confirm()
+
+    def confirm(self):
+        if self.selected is None:
+            return
+        self.result = self.index.options[self.selected]
+        if self.selected in self.recent:
+            self.recent.remove(self.selected)
+        self.recent.insert(0, self.selected)
+        del self.recent[RECENT_LIMIT:]
+        self.done_var.set(True)
+
+    def cancel(self):
+        if self.allow_cancel:
+            self.result = ""
+            self.done_var.set(True)
@@ -0,0 +1,96 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+SAVE_DELAY_SECONDS = 0.5  # repeated saves of the same file within this window are written once
+
+
+def write_json_atomic(path, data, fsync=True):
+    directory = os.path.dirname(path) or "."
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, 'w', encoding="utf-8") as file:
+            json.dump(data, file)  # type: ignore
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def fsync_directory(directory):
+    # makes the renames of write_json_atomic durable, once for all files written to the directory
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    file_descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+class LabelWriter:
+    def __init__(self, delay=SAVE_DELAY_SECONDS):
+        self.delay = delay
+        self.pending = {}  # path -> (data, due time)
+        self.writing = None  # (path, data) currently being written
+
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def save(self, path, data):
+        with self.condition:
+            due = self.pending[path][1] if path in self.pending else time.monotonic() + self.delay
+            self.pending[path] = (data, due)
+            self.condition.notify_all()
+
+    def get_pending(self, path):
+        with self.condition:
+            if path in self.pending:
+                return self.pending[path][0]
+            if self.writing and self.writing[0] == path:
+                return self.writing[1]
+            return None
+
+    def get_pending_count(self):
+        with self.condition:
+            return len(self.pending) + (1 if self.writing else 0)
+
+    def flush(self):
+        with self.condition:
+            self.pending = {path: (data, 0) for path, (data, _) in self.pending.items()}
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: not self.pending and not self.writing)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+
+                path, (data, due) = min(self.pending.items(), key=lambda item: item[1][1])
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+
+                del self.pending[path]
+                self.writing = (path, data)
+
+            # any error is only reported, the worker has to keep running for flush() to return
+            try:
+                write_json_atomic(path, data)
+            except Exception as error:
+                print(f'Could not save {path}: {error!r}')
+            finally:
+                with self.condition:
+                    self.writing = None
+                    self.condition.notify_all()
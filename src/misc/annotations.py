@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import math
+
+
+def get_label_type(tag):
+    return "person" if tag == "person" else "object"
+
+
+class BBox:
+    __slots__ = ('coordinates', 'tag', 'label_type', 'item_ids')
+
+    def __init__(self, coordinates, tag, label_type, item_ids=None):
+        self.coordinates = coordinates  # (x1, y1, x2, y2), both corners inclusive
+        self.tag = tag
+        self.label_type = label_type
+        self.item_ids = item_ids  # canvas items (bbox_id, text_id, group_tag) when drawn by the GUI
+
+    def get_center(self):
+        x1, y1, x2, y2 = self.coordinates
+        return (x1 + x2) / 2, (y1 + y2) / 2
+
+    def get_corners(self):
+        x1, y1, x2, y2 = self.coordinates
+        return [(x1, y1), (x1, y2), (x2, y1), (x2, y2)]
+
+    def to_odgt(self):
+        x_min, y_min, x_max, y_max = self.coordinates
+        return {
+            "tag": self.tag,
+            "box": [int(x_min), int(y_min), int(x_max - x_min + 1), int(y_max - y_min + 1)]
+        }
+
+
+class Interaction:
+    __slots__ = ('subject_id', 'object_id', 'interaction', 'item_ids')
+
+    def __init__(self, subject_id, object_id, interaction, item_ids=None):
+        self.subject_id = subject_id
+        self.object_id = object_id
+        self.interaction = interaction
+        self.item_ids = item_ids  # canvas items (line_id, text_id, group_tag) when drawn by the GUI
+
+    def to_odgt(self):
+        return {
+            "object_id": self.object_id,
+            "interaction": self.interaction,
+            "subject_id": self.subject_id
+        }
+
+
+class AnnotationStore:
+    def __init__(self):
+        self.bboxes = []
+        self.interactions = []
+        self.item_to_bbox = {}  # canvas item id of a bbox rectangle -> bbox index
+        self.bbox_interactions = {}  # bbox index -> indexes of the interactions it takes part in
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    def clear(self):
+        self.bboxes = []
+        self.interactions = []
+        self.item_to_bbox = {}
+        self.bbox_interactions = {}
+
+    def add_bbox(self, coordinates, tag, label_type, item_ids=None):
+        self.bboxes.append(BBox(tuple(coordinates), tag, label_type))
+        idx = len(self.bboxes) - 1
+        self.set_bbox_items(idx, item_ids)
+        return idx
+
+    def set_bbox_items(self, idx, item_ids):
+        bbox = self.bboxes[idx]
+        if bbox.item_ids:
+            self.item_to_bbox.pop(bbox.item_ids[0], None)
+        bbox.item_ids = item_ids
+        if item_ids:
+            self.item_to_bbox[item_ids[0]] = idx
+
+    def move_bbox(self, idx, coordinates):
+        self.bboxes[idx].coordinates = tuple(coordinates)
+
+    def insert_bbox(self, idx, bbox):
+        # inverse of remove_bbox: the bbox currently at idx moves to the end
+        self.bboxes.append(bbox)
+        last = len(self.bboxes) - 1
+        if idx != last:
+            self.relocate_bbox(idx, last)
+            self.bboxes[idx] = bbox
+        if bbox.item_ids:
+            self.item_to_bbox[bbox.item_ids[0]] = idx
+
+    def remove_bbox(self, idx):
+        # the interactions of the bbox have to be removed first; the last bbox takes its place,
+        # so only the interactions of that one bbox need new indexes
+        bbox = self.bboxes[idx]
+        if bbox.item_ids:
+            self.item_to_bbox.pop(bbox.item_ids[0], None)
+        self.bbox_interactions.pop(idx, None)
+
+        last = len(self.bboxes) - 1
+        if idx != last:
+            self.relocate_bbox(last, idx)
+        self.bboxes.pop()
+        return bbox
+
+    def relocate_bbox(self, source, target):
+        bbox = self.bboxes[source]
+        self.bboxes[target] = bbox
+        if bbox.item_ids:
+            self.item_to_bbox[bbox.item_ids[0]] = target
+
+        interaction_indexes = self.bbox_interactions.pop(source, None)
+        if not interaction_indexes:
+            return
+        self.bbox_interactions[target] = interaction_indexes
+        for interaction_index in interaction_indexes:
+            interaction = self.interactions[interaction_index]
+            if interaction.subject_id == source:
+                interaction.subject_id = target
+            if interaction.object_id == source:
+                interaction.object_id = target
+
+    def get_bbox_index_by_item(self, item_id):
+        return self.item_to_bbox.get(item_id)
+
+    def add_interaction(self, subject_id, object_id, interaction, item_ids=None):
+        self.interactions.append(Interaction(subject_id, object_id, interaction, item_ids))
+        idx = len(self.interactions) - 1
+        self.link_interaction(idx)
+        return idx
+
+    def insert_interaction(self, idx, interaction):
+        # inverse of remove_interaction: the interaction currently at idx moves to the end
+        self.interactions.append(interaction)
+        last = len(self.interactions) - 1
+        if idx != last:
+            self.unlink_interaction(idx)
+            self.interactions[last] = self.interactions[idx]
+            self.link_interaction(last)
+            self.interactions[idx] = interaction
+        self.link_interaction(idx)
+
+    def remove_interaction(self, idx):
+        # the last interaction takes the place of the removed one
+        interaction = self.interactions[idx]
+        self.unlink_interaction(idx)
+
+        last = len(self.interactions) - 1
+        if idx != last:
+            self.unlink_interaction(last)
+            self.interactions[idx] = self.interactions[last]
+            self.link_interaction(idx)
+        self.interactions.pop()
+        return interaction
+
+    def link_interaction(self, idx):
+        interaction = self.interactions[idx]
+        for bbox_index in {interaction.subject_id, interaction.object_id}:
+            self.bbox_interactions.setdefault(bbox_index, []).append(idx)
+
+    def unlink_interaction(self, idx):
+        interaction = self.interactions[idx]
+        for bbox_index in {interaction.subject_id, interaction.object_id}:
+            interaction_indexes = self.bbox_interactions[bbox_index]
+            interaction_indexes.remove(idx)
+            if not interaction_indexes:
+                del self.bbox_interactions[bbox_index]
+
+    def get_bbox_interactions(self, bbox_index):
+        return [self.interactions[idx] for idx in self.bbox_interactions.get(bbox_index, ())]
+
+    def get_coordinates(self):
+        return [bbox.coordinates for bbox in self.bboxes]
+
+    def get_corner_distances(self, x, y, indexes=None):
+        # distance from (x, y) to the closest corner of every bbox (or of the given bbox indexes)
+        indexes = range(len(self.bboxes)) if indexes is None else indexes
+        return [min(math.dist((x, y), corner) for corner in self.bboxes[idx].get_corners()) for idx in indexes]
+
+    @classmethod
+    def from_odgt(cls, data):
+        store = cls()
+        for gtbox in data["gtboxes"]:
+            x1, y1, width, height = gtbox["box"]
+            store.add_bbox((x1, y1, x1 + width - 1, y1 + height - 1), gtbox["tag"], get_label_type(gtbox["tag"]))
+
+        for conn in data["hoi"]:
+            store.add_interaction(conn['subject_id'], conn['object_id'], conn['interaction'])
+        return store
+
+    def to_odgt(self, file_name, width, height):
+        return {
+            "file_name": file_name,
+            "height": height,
+            "width": width,
+            "gtboxes": [bbox.to_odgt() for bbox in self.bboxes],
+            "hoi": [interaction.to_odgt() for interaction in self.interactions]
+        }
+
+    def to_hico(self, file_name, object_ids, interaction_ids):
+        # HICO boxes are 1-based (x1, y1, x2, y2)
+        return {
+            'file_name': file_name,
+            'hoi_annotation': [
+                {'subject_id': hoi.subject_id, 'object_id': hoi.object_id,
+                 'category_id': interaction_ids[hoi.interaction]}
+                for hoi in self.interactions
+            ],
+            'annotations': [
+                {'bbox': [x1 + 1, y1 + 1, x2 + 1, y2 + 1], 'category_id': object_ids[bbox.tag]}
+                for bbox, (x1, y1, x2, y2) in zip(self.bboxes, self.get_coordinates())
+            ]
+        }
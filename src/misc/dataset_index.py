@@ -0,0 +1,369 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import Counter
+
+try:
+    from .vocabulary import Vocabulary
+except ImportError:
+    from vocabulary import Vocabulary
+
+try:
+    from ..export import list_label_files, read_label_file
+except ImportError:
+    from export import list_label_files, read_label_file
+
+INDEX_SUFFIX = ".index.sqlite"
+INDEX_VERSION = 2
+TRIPLET_COLUMNS = ("subject_id", "interaction_id", "object_id")
+
+# The postings and counts are tables, so that a query reads only the rows it needs instead of the whole index.
+# Every frame keeps its summary, from which its postings and counts are removed again when it changes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    source_key TEXT PRIMARY KEY,
+    first INTEGER NOT NULL,
+    second INTEGER NOT NULL,
+    frame_id INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS object_frames (
+    object_id INTEGER NOT NULL,
+    frame_id INTEGER NOT NULL,
+    PRIMARY KEY (object_id, frame_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS triplet_frames (
+    subject_id INTEGER NOT NULL,
+    interaction_id INTEGER NOT NULL,
+    object_id INTEGER NOT NULL,
+    frame_id INTEGER NOT NULL,
+    PRIMARY KEY (subject_id, interaction_id, object_id, frame_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS triplet_frames_by_interaction ON triplet_frames (interaction_id, object_id);
+CREATE INDEX IF NOT EXISTS triplet_frames_by_object ON triplet_frames (object_id);
+CREATE TABLE IF NOT EXISTS box_counts (
+    object_id INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS triplet_counts (
+    subject_id INTEGER NOT NULL,
+    interaction_id INTEGER NOT NULL,
+    object_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (subject_id, interaction_id, object_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS unknown_counts (
+    kind TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, tag)
+) WITHOUT ROWID;
+"""
+TABLES = ("meta", "files", "frames", "object_frames", "triplet_frames", "box_counts", "triplet_counts",
+          "unknown_counts")
+
+
+def get_index_path(source_path):
+    return os.path.normpath(source_path) + INDEX_SUFFIX
+
+
+def get_file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class DatasetIndex:
+    def __init__(self, path=":memory:", vocabulary=None):
+        self.vocabulary = vocabulary or Vocabulary()
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # the index can always be rebuilt from its source
+        if self.get_meta("version") != INDEX_VERSION:
+            with self.connection:
+                for table in TABLES:
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+                self.connection.executescript(SCHEMA)
+                self.set_meta("version", INDEX_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get_meta(self, key):
+        # None for a missing key or an index file without tables
+        try:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_source(self):
+        # {"kind": "labels" or "odgt", "path": ..., "signature": ...}
+        return self.get_meta("source")
+
+    def summarize(self, data):
+        object_ids = self.vocabulary.object_ids
+        interaction_ids = self.vocabulary.interaction_ids
+
+        box_counts = Counter()
+        unknown = []
+        for gtbox in data["gtboxes"]:
+            if gtbox["tag"] in object_ids:
+                box_counts[object_ids[gtbox["tag"]]] += 1
+            else:
+                unknown.append(['object', gtbox["tag"]])
+
+        triplets = []
+        box_count = len(data["gtboxes"])
+        for hoi in data["hoi"]:
+            subject_id, object_id = hoi["subject_id"], hoi["object_id"]
+            if not all(isinstance(box_id, int) and 0 <= box_id < box_count for box_id in (subject_id, object_id)):
+                # a hoi that refers to a missing box is reported like an unknown tag instead of failing the build
+                unknown.append(['hoi', f'{subject_id} -> {object_id}'])
+                continue
+            subject_tag = data["gtboxes"][subject_id]["tag"]
+            object_tag = data["gtboxes"][object_id]["tag"]
+            if hoi["interaction"] not in interaction_ids:
+                unknown.append(['interaction', hoi["interaction"]])
+            elif subject_tag in object_ids and object_tag in object_ids:
+                triplets.append([object_ids[subject_tag], interaction_ids[hoi["interaction"]], object_ids[object_tag]])
+
+        return [data["file_name"], [[object_id, count] for object_id, count in box_counts.items()], triplets, unknown]
+
+    def add_frame(self, source_key, signature, text):
+        try:
+            frame = self.summarize(json.loads(text))
+        except (ValueError, KeyError, TypeError):
+            # an unreadable frame is reported like an unknown tag instead of failing the build, and read again
+            # once its source changes
+            frame = [source_key, [], [], [['unreadable', source_key]]]
+        file_name, box_counts, triplets, unknown = frame
+        frame_id = self.connection.execute("INSERT INTO frames (file_name, summary) VALUES (?, ?)",
+                                           (file_name, json.dumps(frame[1:]))).lastrowid
+        self.connection.execute("INSERT INTO files (source_key, first, second, frame_id) VALUES (?, ?, ?, ?)",
+                                (source_key, *signature, frame_id))
+        self.update_postings(frame_id, box_counts, triplets, unknown, 1)
+
+    def remove_frame(self, source_key):
+        frame_id, summary = self.connection.execute(
+            "SELECT f.id, f.summary FROM files s JOIN frames f ON f.id = s.frame_id WHERE s.source_key = ?",
+            (source_key,)
+        ).fetchone()
+        self.connection.execute("DELETE FROM files WHERE source_key = ?", (source_key,))
+        self.connection.execute("DELETE FROM frames WHERE id = ?", (frame_id,))
+        self.update_postings(frame_id, *json.loads(summary), -1)
+
+    def update_postings(self, frame_id, box_counts, triplets, unknown, sign):
+        # adds (sign = 1) or removes (sign = -1) a frame from the postings and the counts
+        execute = self.connection.execute
+        for object_id, count in box_counts:
+            if sign > 0:
+                execute("INSERT INTO object_frames (object_id, frame_id) VALUES (?, ?)", (object_id, frame_id))
+            else:
+                execute("DELETE FROM object_frames WHERE object_id = ? AND frame_id = ?", (object_id, frame_id))
+            execute("INSERT INTO box_counts (object_id, count) VALUES (?, ?) "
+                    "ON CONFLICT (object_id) DO UPDATE SET count = count + excluded.count", (object_id, sign * count))
+
+        for triplet, count in Counter(map(tuple, triplets)).items():
+            if sign > 0:
+                execute("INSERT INTO triplet_frames (subject_id, interaction_id, object_id, frame_id) "
+                        "VALUES (?, ?, ?, ?)", (*triplet, frame_id))
+            else:
+                execute("DELETE FROM triplet_frames "
+                        "WHERE subject_id = ? AND interaction_id = ? AND object_id = ? AND frame_id = ?",
+                        (*triplet, frame_id))
+            execute("INSERT INTO triplet_counts (subject_id, interaction_id, object_id, count) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (subject_id, interaction_id, object_id) DO UPDATE SET count = count + excluded.count",
+                    (*triplet, sign * count))
+
+        for (kind, tag), count in Counter(map(tuple, unknown)).items():
+            execute("INSERT INTO unknown_counts (kind, tag, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (kind, tag) DO UPDATE SET count = count + excluded.count", (kind, tag, sign * count))
+
+    def remove_empty_counts(self):
+        # counts keep no zero entries, so they always equal a rebuild from scratch
+        for table in ("box_counts", "triplet_counts", "unknown_counts"):
+            self.connection.execute(f"DELETE FROM {table} WHERE count = 0")
+
+    def clear(self):
+        for table in TABLES[1:]:
+            self.connection.execute(f"DELETE FROM {table}")
+
+    def update_from_label_directory(self, label_directory):
+        # only label files that were added, changed or deleted since the last update are read
+        source = {"kind": "labels", "path": os.path.abspath(label_directory)}
+        label_files = list_label_files(label_directory)
+        with self.connection:
+            if self.get_source() != source:
+                self.clear()
+                self.set_meta("source", source)
+
+            indexed = {source_key: [first, second]
+                       for source_key, first, second in self.connection.execute("SELECT source_key, first, second "
+                                                                                "FROM files")}
+            removed = [name for name in indexed if name not in label_files]
+            changed = [name for name, signature in label_files.items() if indexed.get(name) != signature]
+
+            for name in removed:
+                self.remove_frame(name)
+            for name in changed:
+                if name in indexed:
+                    self.remove_frame(name)
+                self.add_frame(name, label_files[name], read_label_file(os.path.join(label_directory, name)))
+            self.remove_empty_counts()
+        return len(changed), len(removed)
+
+    def update_from_odgt(self, odgt_path):
+        # an ODGT file is reindexed completely when it changed
+        signature = get_file_signature(odgt_path)
+        source = {"kind": "odgt", "path": os.path.abspath(odgt_path), "signature": signature}
+        if self.get_source() == source:
+            return 0, 0
+
+        removed = len(self)
+        with self.connection:
+            self.clear()
+            self.set_meta("source", source)
+            offset = 0
+            with open(odgt_path, 'rb') as file:
+                for line_number, line in enumerate(file, 1):
+                    if line.strip():
+                        self.add_frame(str(line_number), [offset, len(line)], line)
+                    offset += len(line)
+        return len(self), removed
+
+    def get_file_names(self, frame_query, parameters):
+        return [file_name for file_name, in self.connection.execute(
+            f"SELECT file_name FROM frames WHERE id IN ({frame_query}) ORDER BY file_name", parameters
+        )]
+
+    def get_object_id(self, tag):
+        object_id = self.vocabulary.object_ids.get(tag)
+        if object_id is None:
+            raise KeyError(f"unknown object '{tag}'")
+        return object_id
+
+    def get_interaction_id(self, name):
+        interaction_id = self.vocabulary.interaction_ids.get(name)
+        if interaction_id is None:
+            raise KeyError(f"unknown interaction '{name}'")
+        return interaction_id
+
+    def find_frames_with_objects(self, tags):
+        # file names of the frames that contain a box of every given class
+        object_ids = [self.get_object_id(tag) for tag in tags]
+        if not object_ids:
+            return []
+        frame_query = " INTERSECT ".join(["SELECT frame_id FROM object_frames WHERE object_id = ?"] * len(object_ids))
+        return self.get_file_names(frame_query, object_ids)
+
+    def find_frames(self, subject=None, interaction=None, obj=None):
+        # file names of the frames containing a (subject, interaction, object) triplet; None matches anything
+        wanted = (
+            None if subject is None else self.get_object_id(subject),
+            None if interaction is None else self.get_interaction_id(interaction),
+            None if obj is None else self.get_object_id(obj)
+        )
+        conditions = [f"{column} = ?" for column, value in zip(TRIPLET_COLUMNS, wanted) if value is not None]
+        frame_query = "SELECT frame_id FROM triplet_frames"
+        if conditions:
+            frame_query += " WHERE " + " AND ".join(conditions)
+        return self.get_file_names(frame_query, [value for value in wanted if value is not None])
+
+    def get_box_counts(self):
+        object_names = self.vocabulary.object_names
+        return {object_names[object_id]: count for object_id, count in self.connection.execute(
+            "SELECT object_id, count FROM box_counts ORDER BY count DESC, object_id"
+        )}
+
+    def get_triplet_counts(self):
+        object_names = self.vocabulary.object_names
+        interaction_names = self.vocabulary.interaction_names
+        return {
+            (object_names[subject_id], interaction_names[interaction_id], object_names[object_id]): count
+            for subject_id, interaction_id, object_id, count in self.connection.execute(
+                "SELECT subject_id, interaction_id, object_id, count FROM triplet_counts "
+                "ORDER BY count DESC, subject_id, interaction_id, object_id"
+            )
+        }
+
+    def get_unknown_counts(self):
+        return {(kind, tag): count for kind, tag, count in self.connection.execute(
+            "SELECT kind, tag, count FROM unknown_counts ORDER BY kind, tag"
+        )}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query an index of labeled frames.')
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('--labels', help='Path to a label directory')
+    source_group.add_argument('--odgt', help='Path to an ODGT file')
+    parser.add_argument('--index', help='Path to the index file (default: <source>.index.sqlite)')
+    parser.add_argument('--no-refresh', action='store_true',
+                        help='Answer from the index as it is, without checking the source for changes')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('update', help='Build the index or update it with the changed frames')
+
+    stats_parser = subparsers.add_parser('stats', help='Print box counts and the interaction triplet histogram')
+    stats_parser.add_argument('--top', type=int, default=20, help='Number of triplets to print')
+
+    query_parser = subparsers.add_parser('query', help='List the frames containing a triplet')
+    query_parser.add_argument('--subject', help='Subject class, e.g. person')
+    query_parser.add_argument('--interaction', help='Interaction, e.g. hold')
+    query_parser.add_argument('--object', dest='obj', help='Object class, e.g. cup')
+    query_parser.add_argument('--contains', nargs='+', metavar='CLASS',
+                              help='List the frames with boxes of all these classes instead')
+
+    args = parser.parse_args()
+
+    source_path = args.labels or args.odgt
+    index_path = args.index or get_index_path(source_path)
+    index = DatasetIndex(index_path)
+    changed = removed = 0
+    if args.command == 'update' or not args.no_refresh:
+        if args.labels:
+            changed, removed = index.update_from_label_directory(args.labels)
+        else:
+            changed, removed = index.update_from_odgt(args.odgt)
+
+    if args.command == 'update':
+        print(f'Indexed {changed} changed and removed {removed} frames ({len(index)} frames in {index_path}).')
+    elif args.command == 'stats':
+        print(f'{len(index)} frames')
+        for tag, count in index.get_box_counts().items():
+            print(f'  {tag}: {count} boxes')
+        for (subject, interaction, obj), count in list(index.get_triplet_counts().items())[:args.top]:
+            print(f'  ({subject}, {interaction}, {obj}): {count}')
+        for (kind, tag), count in index.get_unknown_counts().items():
+            print(f"  {kind if kind == 'unreadable' else 'unknown ' + kind} '{tag}': {count}")
+    elif args.command == 'query':
+        if args.contains:
+            file_names = index.find_frames_with_objects(args.contains)
+        else:
+            file_names = index.find_frames(args.subject, args.interaction, args.obj)
+        for file_name in file_names:
+            print(file_name)
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
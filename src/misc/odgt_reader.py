@@ -0,0 +1,165 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import bisect
+import itertools
+import json
+import mmap
+import os
+import re
+
+OFFSETS_SUFFIX = ".offsets"
+
+# records written by json.dumps start with their file name, which saves parsing the whole line
+FILE_NAME_PATTERN = re.compile(rb'\{"file_name": ("(?:[^"\\]|\\.)*")')
+
+
+def get_offsets_path(odgt_path):
+    return odgt_path + OFFSETS_SUFFIX
+
+
+def get_file_name(line):
+    # None for a broken record, which is reported by whoever parses it
+    try:
+        match = FILE_NAME_PATTERN.match(line)
+        if match:
+            return json.loads(match.group(1))
+        return json.loads(line)["file_name"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def build_offsets(data):
+    # start offsets of all non-empty lines, the file name of each record and the number of blank lines in front
+    # of the records that follow blank lines: [[record index, blank lines]]
+    offsets, file_names, blank_lines = [], [], []
+    start = 0
+    size = len(data)
+    blank = 0
+    while start < size:
+        end = data.find(b'\n', start)
+        end = size if end == -1 else end + 1
+        line = data[start:end]
+        if line.strip():
+            if blank:
+                blank_lines.append([len(offsets), blank])
+                blank = 0
+            offsets.append(start)
+            file_names.append(get_file_name(line))
+        else:
+            blank += 1
+        start = end
+    return offsets, file_names, blank_lines
+
+
+class OdgtReader:
+    def __init__(self, odgt_path, use_sidecar=True):
+        self.path = odgt_path
+        self.file = open(odgt_path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.signature = [stat.st_size, stat.st_mtime_ns]
+        # an empty file cannot be memory-mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+
+        loaded = self.load_offsets() if use_sidecar else None
+        if loaded is None:
+            self.offsets, self.file_names, self.blank_lines = build_offsets(self.data)
+            if use_sidecar:
+                self.save_offsets()
+        else:
+            self.offsets, self.file_names, self.blank_lines = loaded
+
+        self.line_ends = self.offsets[1:] + [stat.st_size]
+        self.index_by_file_name = None
+        self.blank_line_records = [index for index, _ in self.blank_lines]
+        self.blank_line_totals = list(itertools.accumulate(count for _, count in self.blank_lines))
+
+    def load_offsets(self):
+        try:
+            with open(get_offsets_path(self.path), 'r') as file:
+                sidecar = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if sidecar.get("signature") != self.signature or "blank_lines" not in sidecar:
+            return None
+        return sidecar["offsets"], sidecar["file_names"], sidecar["blank_lines"]
+
+    def save_offsets(self):
+        try:
+            with open(get_offsets_path(self.path), 'w') as file:
+                json.dump({"signature": self.signature, "offsets": self.offsets, "file_names": self.file_names,
+                           "blank_lines": self.blank_lines}, file)
+        except OSError as error:
+            print(f'Could not write offset index for {self.path}: {error}')
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get_line(self, index):
+        return self.data[self.offsets[index]:self.line_ends[index]]
+
+    def __getitem__(self, index):
+        return json.loads(self.get_line(index))
+
+    def get_index(self, file_name):
+        if self.index_by_file_name is None:
+            self.index_by_file_name = {name: index for index, name in enumerate(self.file_names)}
+        return self.index_by_file_name.get(file_name)
+
+    def get_by_file_name(self, file_name):
+        index = self.get_index(file_name)
+        return None if index is None else self[index]
+
+    def get_byte_range(self, start, end):
+        # bytes of the records start ... end - 1, e.g. to hand a shard of the file to a worker
+        if start >= end:
+            offset = self.offsets[start] if start < len(self) else len(self.data)
+            return offset, offset
+        return self.offsets[start], self.line_ends[end - 1]
+
+    def get_line_number(self, index):
+        # 1-based line of a record in the file, counting the blank lines before it
+        position = bisect.bisect_right(self.blank_line_records, index)
+        return index + 1 + (self.blank_line_totals[position - 1] if position else 0)
+
+    def get_record_at(self, offset):
+        # index of the record containing the byte offset
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+    def iter_lines(self, start=0, end=None):
+        end = len(self) if end is None else end
+        for index in range(start, end):
+            yield self.get_line(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print single records of an ODGT file.')
+    parser.add_argument('--input', required=True, help='Path to the ODGT file')
+    lookup_group = parser.add_mutually_exclusive_group(required=True)
+    lookup_group.add_argument('--index', type=int, help='0-based record number')
+    lookup_group.add_argument('--file-name', help='file_name of the record')
+    args = parser.parse_args()
+
+    with OdgtReader(args.input) as reader:
+        record = reader[args.index] if args.file_name is None else reader.get_by_file_name(args.file_name)
+        if record is None:
+            print(f'{args.file_name} not found in {args.input}.')
+            return
+        print(json.dumps(record, indent=2))
+
+
+if __name__ == "__main__":
+    main()
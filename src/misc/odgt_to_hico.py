@@ -3,53 +3,325 @@
 # SPDX-License-Identifier: MIT
 
 import argparse
+import hashlib
 import json
-from hico_classes import hico_classes_originID, hico_name2id
+import os
+import re
+import shutil
+import sys
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice
+from multiprocessing import Pool
+from odgt_reader import OdgtReader
+from vocabulary import UnknownTagReport, Vocabulary
+
+CHUNK_SIZE = 1000  # ODGT lines per work item
+SHARDS_SUFFIX = ".shards"
+PLAN_NAME = "plan.json"
+READ_BLOCK_SIZE = 1 << 24
+# everything convert_file_sharded writes to its work directory, which is removed only if nothing else is in it
+WORK_FILE_PATTERN = re.compile(r'(shard-\d{5}\.(json|done)|' + re.escape(PLAN_NAME) + r')(\.tmp)?')
+
+VOCABULARY = Vocabulary()
+
+
+def convert_chunk(chunk):
+    first_line_number, lines = chunk
+    converted, unknown = VOCABULARY.convert_batch(lines, first_line_number)
+    return [json.dumps(hico_data) for hico_data in converted], unknown
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    first_line_number = 1
+    while True:
+        lines = list(islice(file, chunk_size))
+        if not lines:
+            return
+        yield first_line_number, lines
+        first_line_number += len(lines)
+
+
+def convert_chunks(chunks, jobs):
+    if jobs <= 1:
+        yield from map(convert_chunk, chunks)
+        return
+
+    # keep only a few chunks in flight so memory stays bounded for arbitrarily large inputs
+    with Pool(jobs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(convert_chunk, (chunk,)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def convert_file(input_path, output_path, jobs=1, chunk_size=CHUNK_SIZE, progress=False):
+    # writes exactly what json.dump would write for the complete list
+    report = UnknownTagReport()
+    count = 0
+    total_lines = 0
+    with open(input_path, 'r', encoding='utf-8') as input_file, open(output_path, "w") as output_file:
+        output_file.write('[')
+        for converted, unknown in convert_chunks(read_chunks(input_file, chunk_size), jobs):
+            for item in converted:
+                if count:
+                    output_file.write(', ')
+                output_file.write(item)
+                count += 1
+
+            report.add(unknown)
+            total_lines += len(converted) + len({line_number for _, _, line_number in unknown})
+            if progress:
+                print(f'\rConverted {count} frames', end='', file=sys.stderr)
+        output_file.write(']')
+
+    if progress:
+        print(file=sys.stderr)
+    if report:
+        print(report.format(total_lines), file=sys.stderr)
+    return count, report
+
+
+def read_blocks(input_file, start, end):
+    input_file.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        block = input_file.read(min(remaining, READ_BLOCK_SIZE))
+        if not block:
+            return
+        yield block
+        remaining -= len(block)
+
+
+def get_range_digest(input_path, start, end):
+    digest = hashlib.blake2b()
+    with open(input_path, 'rb') as input_file:
+        for block in read_blocks(input_file, start, end):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_shards(reader, shards):
+    # the first record of every shard; shards are planned in records rather than bytes, so that fixing a line
+    # does not move the other shards of a resumed run
+    return [len(reader) * shard_index // shards for shard_index in range(shards)]
+
+
+def get_shard_ranges(reader, first_records):
+    # byte range and first line number of every shard; the ranges cover the whole file, so that blank and
+    # broken lines fail the shard they are in
+    first_records = [min(first_record, len(reader)) for first_record in first_records[1:]]
+    starts = [0] + [reader.get_byte_range(first_record, len(reader))[0] for first_record in first_records]
+    ranges = list(zip(starts, starts[1:] + [len(reader.data)]))
+    line_numbers = [1] + [reader.get_line_number(first_record) if first_record < len(reader) else len(reader) + 1
+                          for first_record in first_records]
+    return ranges, line_numbers
+
+
+def load_plan(plan_path, input_path, shards):
+    try:
+        with open(plan_path, 'r') as file:
+            plan = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if plan.get("input") != os.path.abspath(input_path) or len(plan.get("first_records", [])) != shards:
+        return None
+    return plan["first_records"]
+
+
+def save_plan(plan_path, input_path, first_records):
+    with open(plan_path + '.tmp', 'w') as file:
+        json.dump({"input": os.path.abspath(input_path), "first_records": first_records}, file)
+    os.replace(plan_path + '.tmp', plan_path)
+
+
+def remove_work_files(work_dir):
+    # only the files of the conversion are removed, a work directory chosen with --work-dir may hold others
+    for name in os.listdir(work_dir):
+        if WORK_FILE_PATTERN.fullmatch(name):
+            os.remove(os.path.join(work_dir, name))
+    try:
+        os.rmdir(work_dir)
+    except OSError:
+        pass
+
+
+def get_shard_paths(work_dir, shard_index):
+    base_path = os.path.join(work_dir, f'shard-{shard_index:05d}')
+    return base_path + '.json', base_path + '.done'
+
+
+def find_bad_line(lines, first_line_number):
+    for line_number, line in enumerate(lines, first_line_number):
+        try:
+            VOCABULARY.convert_batch([line], line_number)
+        except (ValueError, KeyError, IndexError, TypeError) as error:
+            return f'line {line_number}: {error!r}'
+    return f'lines {first_line_number}-{first_line_number + len(lines) - 1}'
+
+
+def convert_shard(task):
+    # converts the records in one byte range of the input into a fragment of the HICO list, then writes the
+    # checkpoint that marks the shard as done
+    input_path, shard_index, work_dir, checkpoint = task
+    fragment_path, checkpoint_path = get_shard_paths(work_dir, shard_index)
+    start, end = checkpoint["range"]
+    line_number = checkpoint["first_line_number"]
+    count = 0
+    unknown = []
+    digest = hashlib.blake2b()
+
+    with open(input_path, 'rb') as input_file, open(fragment_path + '.tmp', 'w') as fragment_file:
+        input_file.seek(start)
+        while input_file.tell() < end:
+            lines = []
+            while len(lines) < CHUNK_SIZE and input_file.tell() < end:
+                lines.append(input_file.readline())
+                digest.update(lines[-1])
+
+            try:
+                converted, chunk_unknown = VOCABULARY.convert_batch(lines, line_number)
+            except (ValueError, KeyError, IndexError, TypeError):
+                return shard_index, None, find_bad_line(lines, line_number)
+
+            for hico_data in converted:
+                if count:
+                    fragment_file.write(', ')
+                fragment_file.write(json.dumps(hico_data))
+                count += 1
+            unknown.extend(chunk_unknown)
+            line_number += len(lines)
+
+    os.replace(fragment_path + '.tmp', fragment_path)
+    checkpoint = dict(checkpoint, digest=digest.hexdigest(), count=count, unknown=unknown)
+    with open(checkpoint_path + '.tmp', 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+    return shard_index, checkpoint, None
+
+
+def load_checkpoint(input_path, checkpoint_path, expected):
+    # a finished shard is reused as long as the bytes of its range did not change
+    try:
+        with open(checkpoint_path, 'r') as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    # the range itself may have moved when an earlier line was fixed
+    if any(checkpoint.get(key) != expected[key] for key in ("input", "shards", "first_line_number")):
+        return None
+    if checkpoint.get("digest") != get_range_digest(input_path, *expected["range"]):
+        return None
+    return checkpoint
+
+
+def convert_file_sharded(input_path, output_path, shards, jobs=1, work_dir=None, resume=False, progress=False):
+    # the input is split into byte ranges that are converted independently; finished shards are checkpointed
+    # in work_dir, so that an interrupted or failed conversion can continue with --resume
+    work_dir = work_dir or output_path + SHARDS_SUFFIX
+    os.makedirs(work_dir, exist_ok=True)
+
+    # the record offsets are cached next to the input, so a resumed run does not scan the file again
+    plan_path = os.path.join(work_dir, PLAN_NAME)
+    with OdgtReader(input_path) as reader:
+        first_records = load_plan(plan_path, input_path, shards) if resume else None
+        if first_records is None:
+            first_records = plan_shards(reader, shards)
+            save_plan(plan_path, input_path, first_records)
+        ranges, line_numbers = get_shard_ranges(reader, first_records)
+
+    expected = [{
+        "input": os.path.abspath(input_path),
+        "shards": shards,
+        "range": list(ranges[shard_index]),
+        "first_line_number": line_numbers[shard_index]
+    } for shard_index in range(shards)]
+
+    checkpoints = {}
+    if resume:
+        for shard_index in range(shards):
+            checkpoint = load_checkpoint(input_path, get_shard_paths(work_dir, shard_index)[1], expected[shard_index])
+            if checkpoint is not None:
+                checkpoints[shard_index] = checkpoint
+
+    tasks = [(input_path, shard_index, work_dir, expected[shard_index])
+             for shard_index in range(shards) if shard_index not in checkpoints]
+    failures = []
+    with Pool(jobs) if jobs > 1 else nullcontext() as pool:
+        results = pool.imap_unordered(convert_shard, tasks) if pool else map(convert_shard, tasks)
+        for shard_index, checkpoint, error in results:
+            if checkpoint is None:
+                failures.append((shard_index, error))
+            else:
+                checkpoints[shard_index] = checkpoint
+            if progress:
+                print(f'\rConverted {len(checkpoints)} of {shards} shards', end='', file=sys.stderr)
+    if progress:
+        print(file=sys.stderr)
+
+    if failures:
+        for shard_index, error in sorted(failures):
+            print(f'Shard {shard_index} failed at {error}', file=sys.stderr)
+        print(f'{len(failures)} of {shards} shards failed; fix the input and rerun with --resume.', file=sys.stderr)
+        return None, None
+
+    # the merged output is identical to the one of convert_file
+    report = UnknownTagReport()
+    count = 0
+    total_lines = 0
+    with open(output_path, 'w') as output_file:
+        output_file.write('[')
+        for shard_index in range(shards):
+            checkpoint = checkpoints[shard_index]
+            if checkpoint["count"]:
+                if count:
+                    output_file.write(', ')
+                with open(get_shard_paths(work_dir, shard_index)[0], 'r') as fragment_file:
+                    shutil.copyfileobj(fragment_file, output_file)
+                count += checkpoint["count"]
+
+            unknown = [tuple(entry) for entry in checkpoint["unknown"]]
+            report.add(unknown)
+            total_lines += checkpoint["count"] + len({line_number for _, _, line_number in unknown})
+        output_file.write(']')
+
+    remove_work_files(work_dir)
+    if report:
+        print(report.format(total_lines), file=sys.stderr)
+    return count, report
+
 
 def main():
     parser = argparse.ArgumentParser(description='Convert ODGT file to HICO JSON format.')
     parser.add_argument('--input', required=True, help='Path to the input ODGT file')
     parser.add_argument('--output', required=True, help='Path to the output JSON file')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of worker processes (0 uses all CPU cores)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Number of ODGT lines per work item')
+    parser.add_argument('--quiet', action='store_true', help='Do not report progress')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Split the input into this many independently converted and checkpointed shards')
+    parser.add_argument('--resume', action='store_true', help='Skip shards finished by a previous run')
+    parser.add_argument('--work-dir', help='Directory for shard checkpoints (default: <output>.shards)')
     args = parser.parse_args()
+    if args.resume and not args.shards:
+        parser.error('--resume requires --shards')
+
+    jobs = args.jobs or os.cpu_count()
+    if args.shards:
+        count, report = convert_file_sharded(args.input, args.output, args.shards, jobs=jobs, work_dir=args.work_dir,
+                                             resume=args.resume, progress=not args.quiet)
+        if count is None:
+            sys.exit(2)
+    else:
+        _, report = convert_file(args.input, args.output, jobs=jobs, chunk_size=args.chunk_size,
+                                 progress=not args.quiet)
+    if report:
+        sys.exit(1)
 
-    with open(args.input, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-
-    json_data = []
-    for line in lines:
-        hico_data = {}
-        data = json.loads(line)
-
-        hico_data['file_name'] = data['file_name']
-
-        hoi_annotations = []
-        for hoi in data['hoi']:
-            hoi_annotation = {
-                'subject_id': hoi['subject_id'],
-                'object_id': hoi['object_id'],
-                'category_id': hico_name2id[hoi['interaction']]
-            }
-            hoi_annotations.append(hoi_annotation)
-        hico_data['hoi_annotation'] = hoi_annotations
-
-        annotations = []
-        for gtbox in data['gtboxes']:
-            annotation = {}
-            bbox = gtbox['box']
-            annotation['bbox'] = [
-                bbox[0] + 1, 
-                bbox[1] + 1, 
-                bbox[0] + bbox[2], 
-                bbox[1] + bbox[3]
-            ]
-            annotation['category_id'] = hico_classes_originID[gtbox['tag']]
-            annotations.append(annotation)
-        hico_data['annotations'] = annotations
-
-        json_data.append(hico_data)
-
-    with open(args.output, "w") as file:
-        json.dump(json_data, file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
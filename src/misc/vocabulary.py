@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+
+try:
+    from .annotations import AnnotationStore
+    from .hico_classes import hico_classes_originID, hico_name2id
+except ImportError:
+    from annotations import AnnotationStore
+    from hico_classes import hico_classes_originID, hico_name2id
+
+
+class Vocabulary:
+    def __init__(self, object_ids=None, interaction_ids=None):
+        object_ids = hico_classes_originID if object_ids is None else object_ids
+        interaction_ids = hico_name2id if interaction_ids is None else interaction_ids
+
+        self.object_ids = dict(object_ids)
+        self.interaction_ids = dict(interaction_ids)
+        self.object_names = {category_id: name for name, category_id in self.object_ids.items()}
+        self.interaction_names = {category_id: name for name, category_id in self.interaction_ids.items()}
+
+    def get_unknown_objects(self, names):
+        return [name for name in names if name not in self.object_ids]
+
+    def get_unknown_interactions(self, names):
+        return [name for name in names if name not in self.interaction_ids]
+
+    def convert_batch(self, lines, first_line_number=1):
+        # returns the HICO records of all frames with known tags and the unknown tags that were found:
+        # [(kind, tag, line number)]
+        records = [json.loads(line) for line in lines]
+
+        # the tags of the whole batch are looked up at once, frames are only checked one by one if some are unknown
+        unknown_objects = {gtbox['tag'] for data in records for gtbox in data['gtboxes']}.difference(self.object_ids)
+        unknown_interactions = {hoi['interaction'] for data in records
+                                for hoi in data['hoi']}.difference(self.interaction_ids)
+
+        converted = []
+        unknown = []
+        for line_number, data in enumerate(records, first_line_number):
+            store = AnnotationStore.from_odgt(data)
+            if unknown_objects or unknown_interactions:
+                frame_unknown = [('object', bbox.tag, line_number)
+                                 for bbox in store.bboxes if bbox.tag in unknown_objects]
+                frame_unknown.extend(('interaction', hoi.interaction, line_number)
+                                     for hoi in store.interactions if hoi.interaction in unknown_interactions)
+                if frame_unknown:
+                    unknown.extend(frame_unknown)
+                    continue
+
+            converted.append(store.to_hico(data['file_name'], self.object_ids, self.interaction_ids))
+
+        return converted, unknown
+
+
+class UnknownTagReport:
+    def __init__(self):
+        self.tags = {}  # (kind, tag) -> [count, first line number]
+        self.skipped_lines = set()
+
+    def add(self, unknown):
+        for kind, tag, line_number in unknown:
+            entry = self.tags.setdefault((kind, tag), [0, line_number])
+            entry[0] += 1
+            entry[1] = min(entry[1], line_number)
+            self.skipped_lines.add(line_number)
+
+    def __bool__(self):
+        return bool(self.tags)
+
+    def format(self, total_lines):
+        lines = [f'Skipped {len(self.skipped_lines)} of {total_lines} frames with unknown tags:']
+        for (kind, tag), (count, first_line_number) in sorted(self.tags.items()):
+            lines.append(f"  {kind} '{tag}': {count}x (first on line {first_line_number})")
+        return '\n'.join(lines)
@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+import os
+from concurrent.futures import CancelledError
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+from background import BackgroundPool
+from label_writer import write_json_atomic
+from misc.hico_classes import hico_classes_originID
+
+PROPOSAL_ROOT = "Proposals"
+PREANNOTATION_WORKERS = 2
+MAX_PENDING_DETECTIONS = 16
+SCORE_THRESHOLD = 0.4
+NMS_THRESHOLD = 0.45
+HASH_BLOCK_SIZE = 1 << 20
+
+# the HICO objects are the COCO classes: SSD models return the COCO category ids, YOLO models number the
+# same classes 0 ... 79
+COCO_NAMES = {category_id: name for name, category_id in hico_classes_originID.items()}
+YOLO_NAMES = [COCO_NAMES[category_id] for category_id in sorted(COCO_NAMES)]
+
+
+def get_image_hash(image_path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(image_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_iou(coordinates, other):
+    x1, y1, x2, y2 = coordinates
+    other_x1, other_y1, other_x2, other_y2 = other
+    width = min(x2, other_x2) - max(x1, other_x1) + 1
+    height = min(y2, other_y2) - max(y1, other_y1) + 1
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    other_area = (other_x2 - other_x1 + 1) * (other_y2 - other_y1 + 1)
+    return intersection / (area + other_area - intersection)
+
+
+def clip_box(x1, y1, x2, y2, width, height):
+    return (max(0, min(int(x1), width - 1)), max(0, min(int(y1), height - 1)),
+            max(0, min(int(x2), width - 1)), max(0, min(int(y2), height - 1)))
+
+
+# A detector returns [(tag, score, (x1, y1, x2, y2))] in image pixels for an image path. get_key identifies
+# the model and its settings, so that cached proposals of another model are not reused.
+
+class StubDetector:
+    # fixed proposals relative to the image size, for tests without a model
+    def get_key(self):
+        return "stub"
+
+    def detect(self, image_path):
+        with Image.open(image_path) as image:
+            width, height = image.size
+        return [("person", 0.9, (width // 8, height // 8, width * 3 // 8, height * 7 // 8)),
+                ("cup", 0.6, (width // 2, height // 2, width * 5 // 8, height * 5 // 8))]
+
+
+class OpenCVDetector:
+    # a local model file read with OpenCV DNN and run on the CPU: YOLOv5/v8 exported to ONNX ("yolo") or
+    # SSD-style models with a [N, 7] detection output ("ssd")
+    def __init__(self, model, config="", output="yolo", input_size=640, score_threshold=SCORE_THRESHOLD,
+                 nms_threshold=NMS_THRESHOLD):
+        import cv2  # only needed for this backend
+
+        self.cv2 = cv2
+        self.model = model
+        self.output = output
+        self.input_size = input_size
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.net = cv2.dnn.readNet(model, config)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def get_key(self):
+        stat = os.stat(self.model)
+        return (f'opencv:{os.path.basename(self.model)}:{stat.st_size}:{stat.st_mtime_ns}:{self.output}:'
+                f'{self.input_size}:{self.score_threshold}:{self.nms_threshold}')
+
+    def detect(self, image_path):
+        image = self.cv2.imread(image_path)
+        if image is None:
+            raise OSError(f'Could not read {image_path}')
+        if self.output == "ssd":
+            return self.detect_ssd(image)
+        return self.detect_yolo(image)
+
+    def detect_ssd(self, image):
+        height, width = image.shape[:2]
+        blob = self.cv2.dnn.blobFromImage(image, size=(self.input_size, self.input_size), swapRB=True)
+        self.net.setInput(blob)
+
+        proposals = []
+        for _, class_id, score, x1, y1, x2, y2 in self.net.forward().reshape(-1, 7):
+            tag = COCO_NAMES.get(int(class_id))
+            if tag is not None and score >= self.score_threshold:
+                proposals.append((tag, float(score), clip_box(x1 * width, y1 * height, x2 * width, y2 * height,
+                                                              width, height)))
+        return proposals
+
+    def detect_yolo(self, image):
+        height, width = image.shape[:2]
+        blob = self.cv2.dnn.blobFromImage(image, 1 / 255, (self.input_size, self.input_size), swapRB=True)
+        self.net.setInput(blob)
+
+        output = self.net.forward()[0]
+        if output.shape[0] < output.shape[1]:
+            output = output.T  # YOLOv8 returns one column per candidate
+        if output.shape[1] == len(YOLO_NAMES) + 5:
+            scores = output[:, 5:] * output[:, 4:5]  # YOLOv5 has an objectness column
+        else:
+            scores = output[:, 4:]
+
+        class_ids = np.argmax(scores, axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        candidates = np.flatnonzero(confidences >= self.score_threshold)
+
+        scale_x, scale_y = width / self.input_size, height / self.input_size
+        boxes = []
+        for center_x, center_y, box_width, box_height in output[candidates, :4]:
+            boxes.append([float((center_x - box_width / 2) * scale_x), float((center_y - box_height / 2) * scale_y),
+                          float(box_width * scale_x), float(box_height * scale_y)])
+        kept = self.cv2.dnn.NMSBoxes(boxes, confidences[candidates].tolist(), self.score_threshold,
+                                     self.nms_threshold)
+
+        proposals = []
+        for k in np.asarray(kept).flatten():
+            x, y, box_width, box_height = boxes[k]
+            i = candidates[k]
+            proposals.append((YOLO_NAMES[class_ids[i]], float(confidences[i]),
+                              clip_box(x, y, x + box_width, y + box_height, width, height)))
+        return proposals
+
+
+DETECTORS = {"stub": StubDetector, "opencv": OpenCVDetector}
+
+
+def create_detector(options):
+    options = dict(options)
+    return DETECTORS[options.pop("backend")](**options)
+
+
+detector = None  # the detector of a worker process, created once by init_worker
+
+
+def init_worker(options):
+    global detector
+    detector = create_detector(options)
+
+
+def detect_cached(image_path, cache_directory):
+    # proposals are cached by image content and model, so no image is ever detected twice
+    model_key = hashlib.blake2b(detector.get_key().encode(), digest_size=8).hexdigest()
+    cache_path = os.path.join(cache_directory, f'{get_image_hash(image_path)}-{model_key}.json')
+    try:
+        with open(cache_path, 'r') as file:
+            return [(tag, score, tuple(coordinates)) for tag, score, coordinates in json.load(file)]
+    except (OSError, ValueError):
+        pass
+
+    proposals = [(tag, float(score), tuple(int(value) for value in coordinates))
+                 for tag, score, coordinates in detector.detect(image_path)]
+    write_json_atomic(cache_path, proposals, fsync=False)
+    return proposals
+
+
+class PreAnnotator:
+    def __init__(self, options, cache_directory=PROPOSAL_ROOT, workers=PREANNOTATION_WORKERS):
+        if options.get("backend") not in DETECTORS:
+            raise ValueError(f'Unknown pre-annotation backend {options.get("backend")!r}, '
+                             f'expected one of {", ".join(DETECTORS)}')
+        self.cache_directory = cache_directory
+        self.pool = BackgroundPool(workers, MAX_PENDING_DETECTIONS, init_worker, (dict(options),))  # by image path
+        self.stopped = False
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def submit(self, image_path):
+        if not self.stopped:
+            self.pool.submit(image_path, detect_cached, image_path, self.cache_directory)
+
+    def prefetch(self, image_paths):
+        # the first path is the most urgent one
+        for image_path in image_paths:
+            self.submit(image_path)
+
+    def is_pending(self, image_path):
+        future = self.pool.get_future(image_path)
+        return future is not None and not future.done()
+
+    def get(self, image_path):
+        # proposals of a finished detection, or None
+        future = self.pool.get_future(image_path)
+        if future is None or not future.done():
+            return None
+        try:
+            return future.result()
+        except CancelledError:
+            self.pool.discard(image_path)
+        except BrokenProcessPool as error:
+            # a backend that cannot start (missing module, unreadable model) would fail for every image
+            print(f'Pre-annotation stopped: {error}')
+            self.shutdown()
+            self.stopped = True
+        except Exception as error:  # noqa: the backends are pluggable, so any error is reported per image
+            print(f'Could not pre-annotate {image_path}: {error}')
+        return None
+
+    def shutdown(self):
+        self.pool.shutdown()
@@ -0,0 +1,112 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+import hashlib
+import os
+import tempfile
+
+from PIL import Image
+
+from background import map_in_threads
+from scanner import list_images
+
+PROXY_ROOT = "Proxies"
+PROXY_SIZE = 1024  # proxies are reduced until their longest side is at most this size
+PROXY_QUALITY = 85
+PROXY_WORKERS = 4
+
+
+def get_reduction(width, height, max_size=PROXY_SIZE):
+    # powers of two keep the proxy aligned with the pyramid levels of the renderer
+    reduction = 1
+    while max(width, height) > max_size * reduction:
+        reduction *= 2
+    return reduction
+
+
+def create_proxy(image, reduction):
+    # JPEG images are decoded at a reduced scale right away, which skips most of the decoding work;
+    # other formats, or the rest of the reduction, are reduced after decoding
+    full_width = image.width
+    image.draft(image.mode, (image.width // reduction, image.height // reduction))
+    image.load()
+
+    remaining = reduction // max(1, round(full_width / image.width))
+    proxy = image.reduce(remaining) if remaining > 1 else image
+    if proxy.mode not in ("RGB", "L"):
+        proxy = proxy.convert("RGB")
+    return proxy
+
+
+class ProxyCache:
+    def __init__(self, cache_directory=PROXY_ROOT, max_size=PROXY_SIZE):
+        self.cache_directory = cache_directory
+        self.max_size = max_size
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def get_proxy_path(self, image_path):
+        # a changed image gets a new proxy, since its size and modification time are part of the key
+        stat = os.stat(image_path)
+        key = f'{os.path.abspath(image_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{self.max_size}'
+        return os.path.join(self.cache_directory, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '.jpg')
+
+    def get(self, image_path):
+        # returns the proxy, the factor it is reduced by and the size of the full image, or None if the image is
+        # small enough to be shown as is; only the header of the full image is read when the proxy is cached
+        proxy_path = self.get_proxy_path(image_path)
+        with Image.open(image_path) as image:
+            width, height = image.size
+            reduction = get_reduction(width, height, self.max_size)
+            if reduction == 1:
+                return None
+
+            try:
+                proxy = Image.open(proxy_path)
+                proxy.load()
+            except OSError:
+                proxy = create_proxy(image, reduction)
+                self.save(proxy, proxy_path)
+        return proxy, reduction, (width, height)
+
+    def save(self, proxy, proxy_path):
+        # proxies are written under a temporary name, so that a reader never sees a partial file
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                proxy.save(file, format='JPEG', quality=PROXY_QUALITY)
+            os.replace(temp_path, proxy_path)
+        except OSError as error:
+            print(f'Could not cache proxy {proxy_path}: {error}')
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def create_all(self, image_paths, workers=PROXY_WORKERS):
+        def create(image_path):
+            try:
+                self.get(image_path)
+                return True
+            except OSError as error:
+                print(f'Could not create proxy for {image_path}: {error}')
+                return False
+
+        return sum(map_in_threads(create, image_paths, workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create the proxy images of an image directory in advance.')
+    parser.add_argument('--images', required=True, help='Path to the image directory')
+    parser.add_argument('--recursive', action='store_true', help='Include images in subdirectories')
+    parser.add_argument('--cache', default=PROXY_ROOT, help=f'Proxy cache directory (default: {PROXY_ROOT})')
+    parser.add_argument('--size', type=int, default=PROXY_SIZE, help='Maximum side length of the proxies')
+    parser.add_argument('--jobs', type=int, default=PROXY_WORKERS, help='Number of worker threads')
+    args = parser.parse_args()
+
+    image_paths = list_images(args.images, recursive=args.recursive)
+    created = ProxyCache(args.cache, args.size).create_all(image_paths, workers=args.jobs)
+    print(f'Cached proxies of {created} of {len(image_paths)} images in {args.cache}.')
+
+
+if __name__ == "__main__":
+    main()
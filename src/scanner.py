@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from background import BackgroundTask
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MANIFEST_NAME = ".image_manifest.json"
+SCAN_WORKERS = 8
+SCAN_BATCH_SIZE = 256  # images reported at a time while a directory is still being listed
+
+
+def natural_sort_key(path):
+    # "frame2.jpg" sorts before "frame10.jpg"
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path)]
+
+
+def is_image(name):
+    return name.lower().endswith(ALLOWED_EXTENSIONS) and not name.startswith('.')
+
+
+def scan_single_directory(directory, on_images=None):
+    image_paths, subdirectories = [], []
+    reported = 0
+    with os.scandir(directory) as iterator:
+        for entry in iterator:
+            if entry.is_dir() and not entry.name.startswith('.'):
+                subdirectories.append(entry.path)
+            elif is_image(entry.name) and entry.is_file():
+                image_paths.append(entry.path)
+                if on_images and len(image_paths) - reported >= SCAN_BATCH_SIZE:
+                    on_images(image_paths[reported:])
+                    reported = len(image_paths)
+
+    if on_images and len(image_paths) > reported:
+        on_images(image_paths[reported:])
+    return image_paths, subdirectories
+
+
+def scan_directory(directory, recursive=False, on_images=None, workers=SCAN_WORKERS):
+    # returns all image paths in natural order and the mtimes of the scanned directories
+    image_paths = []
+    directory_mtimes = {}
+    level = [directory]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while level:
+            next_level = []
+            results = executor.map(lambda scanned: scan_single_directory(scanned, on_images), level)
+            for scanned_directory, (found, subdirectories) in zip(level, results):
+                directory_mtimes[os.path.relpath(scanned_directory, directory)] = os.stat(scanned_directory).st_mtime_ns
+                image_paths.extend(found)
+                next_level.extend(subdirectories)
+            level = next_level if recursive else []
+
+    image_paths.sort(key=natural_sort_key)
+    return image_paths, directory_mtimes
+
+
+def load_manifest(manifest_path, directory, recursive=False):
+    try:
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("directory") != os.path.abspath(directory) or manifest.get("recursive") != recursive:
+        return None
+
+    # the manifest is valid as long as no scanned directory gained or lost entries
+    for relative_path, mtime in manifest["directory_mtimes"].items():
+        try:
+            if os.stat(os.path.join(directory, relative_path)).st_mtime_ns != mtime:
+                return None
+        except OSError:
+            return None
+
+    return [os.path.join(directory, relative_path) for relative_path in manifest["images"]]
+
+
+def save_manifest(manifest_path, directory, recursive, image_paths, directory_mtimes):
+    manifest = {
+        "directory": os.path.abspath(directory),
+        "recursive": recursive,
+        "directory_mtimes": directory_mtimes,
+        "images": [os.path.relpath(image_path, directory) for image_path in image_paths]
+    }
+    try:
+        with open(manifest_path, 'w') as file:
+            json.dump(manifest, file)
+    except OSError as error:
+        print(f'Could not write image manifest {manifest_path}: {error}')
+
+
+def list_images(directory, recursive=False, manifest_path=None, on_images=None):
+    if manifest_path:
+        image_paths = load_manifest(manifest_path, directory, recursive)
+        if image_paths is not None:
+            return image_paths
+
+    image_paths, directory_mtimes = scan_directory(directory, recursive, on_images)
+    if manifest_path:
+        save_manifest(manifest_path, directory, recursive, image_paths, directory_mtimes)
+    return image_paths
+
+
+class BackgroundScan(BackgroundTask):
+    # the result is the complete natural-sorted list of image paths
+    def __init__(self, directory, recursive=False, manifest_path=None):
+        self.found = []  # image paths found so far, unsorted
+        super().__init__(self.scan, directory, recursive, manifest_path)
+
+    def scan(self, directory, recursive, manifest_path):
+        try:
+            return list_images(directory, recursive, manifest_path, on_images=self.add_found)
+        except OSError as error:
+            print(f'Could not scan {directory}: {error}')
+            return []
+
+    def add_found(self, image_paths):
+        with self.lock:
+            self.found.extend(image_paths)
+
+    def get_found_count(self):
+        with self.lock:
+            return len(self.found)
+
+    def get_image_paths(self):
+        # the complete list once the scan is done, otherwise the images found so far
+        with self.lock:
+            if self.done:
+                return self.result
+            return sorted(self.found, key=natural_sort_key)
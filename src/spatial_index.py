@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import math
+
+GRID_CELL_SIZE = 128
+LARGE_BOX_CELLS = 64  # boxes covering more cells are kept in a separate list instead of the grid
+
+
+def get_bbox_corners(bbox):
+    x1, y1, x2, y2 = bbox
+    return [
+        (x1, y1),  # top-left
+        (x1, y2),  # bottom-left
+        (x2, y1),  # top-right
+        (x2, y2)  # bottom-right
+    ]
+
+
+class BBoxGridIndex:
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.boxes = {}  # bbox index -> (x1, y1, x2, y2)
+        self.box_cells = {}  # cell -> set of bbox indexes overlapping the cell
+        self.large_boxes = set()
+        self.corner_cells = {}  # cell -> set of (bbox index, corner index)
+
+    def clear(self):
+        self.boxes = {}
+        self.box_cells = {}
+        self.large_boxes = set()
+        self.corner_cells = {}
+
+    def rebuild(self, bboxes):
+        self.clear()
+        for idx, bbox in enumerate(bboxes):
+            self.insert(idx, bbox)
+
+    def get_cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def get_covered_cells(self, bbox):
+        column1, row1 = self.get_cell(bbox[0], bbox[1])
+        column2, row2 = self.get_cell(bbox[2], bbox[3])
+        return [(column, row) for column in range(column1, column2 + 1) for row in range(row1, row2 + 1)]
+
+    def insert(self, idx, bbox):
+        self.boxes[idx] = bbox
+
+        cells = self.get_covered_cells(bbox)
+        if len(cells) > LARGE_BOX_CELLS:
+            self.large_boxes.add(idx)
+        else:
+            for cell in cells:
+                self.box_cells.setdefault(cell, set()).add(idx)
+
+        for corner_idx, (cx, cy) in enumerate(get_bbox_corners(bbox)):
+            self.corner_cells.setdefault(self.get_cell(cx, cy), set()).add((idx, corner_idx))
+
+    def remove(self, idx):
+        bbox = self.boxes.pop(idx)
+
+        if idx in self.large_boxes:
+            self.large_boxes.discard(idx)
+        else:
+            for cell in self.get_covered_cells(bbox):
+                self.discard_from_cell(self.box_cells, cell, idx)
+
+        for corner_idx, (cx, cy) in enumerate(get_bbox_corners(bbox)):
+            self.discard_from_cell(self.corner_cells, self.get_cell(cx, cy), (idx, corner_idx))
+
+    def update(self, idx, bbox):
+        if self.boxes.get(idx) == bbox:
+            return
+        self.remove(idx)
+        self.insert(idx, bbox)
+
+    @staticmethod
+    def discard_from_cell(cells, cell, entry):
+        entries = cells.get(cell)
+        if entries is None:
+            return
+        entries.discard(entry)
+        if not entries:
+            del cells[cell]
+
+    def query_point(self, x, y):
+        candidates = self.box_cells.get(self.get_cell(x, y), set()) | self.large_boxes
+        return sorted(
+            idx for idx in candidates
+            if self.boxes[idx][0] <= x <= self.boxes[idx][2] and self.boxes[idx][1] <= y <= self.boxes[idx][3]
+        )
+
+    def query_corners(self, x, y, radius):
+        column1, row1 = self.get_cell(x - radius, y - radius)
+        column2, row2 = self.get_cell(x + radius, y + radius)
+
+        matches = []
+        for column in range(column1, column2 + 1):
+            for row in range(row1, row2 + 1):
+                for idx, corner_idx in self.corner_cells.get((column, row), ()):
+                    distance = math.dist((x, y), get_bbox_corners(self.boxes[idx])[corner_idx])
+                    if distance <= radius:
+                        matches.append((idx, corner_idx, distance))
+
+        matches.sort()
+        return matches
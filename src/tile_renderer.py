@@ -0,0 +1,135 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+from PIL import Image, ImageTk
+
+TILE_SIZE = 512
+ZOOM_LEVELS = [1 / 8, 1 / 4, 1 / 2, 1, 2, 4, 8]  # powers of two keep canvas <-> image mapping exact
+
+
+class TiledImageRenderer:
+    def __init__(self, canvas, tile_size=TILE_SIZE):
+        self.canvas = canvas
+        self.tile_size = tile_size
+        self.image = None
+        self.reduction = 1  # full resolution pixels per pixel of the image, > 1 for proxies
+        self.pyramid = []  # level k holds the image reduced by a factor of 2 ** k
+        self.zoom = 1
+        self.tiles = {}  # (column, row) -> (item_id, photo_image)
+        self.render_scheduled = False
+
+    def set_image(self, image, reduction=1):
+        # zoom and scroll position are kept, so a proxy can be replaced by the full image in place
+        self.clear_tiles()
+        self.image = image
+        self.reduction = reduction
+        self.pyramid = [image]
+        self.update_scrollregion()
+        self.render()
+
+    def clear_tiles(self):
+        self.canvas.delete("tile")
+        self.tiles = {}
+
+    def get_level(self, level):
+        while len(self.pyramid) <= level:
+            self.pyramid.append(self.pyramid[-1].reduce(2))
+        return self.pyramid[level]
+
+    def get_level_and_scale(self):
+        # zooming out reads from a reduced pyramid level, zooming in upscales the original pixels
+        zoom = self.zoom * self.reduction
+        if zoom >= 1:
+            return 0, int(zoom)
+        return int(round(1 / zoom)).bit_length() - 1, 1
+
+    def get_scaled_size(self):
+        level, scale = self.get_level_and_scale()
+        source = self.get_level(level)
+        return source.width * scale, source.height * scale
+
+    def to_canvas(self, *values):
+        return [value * self.zoom for value in values]
+
+    def to_image(self, *values):
+        return [value / self.zoom for value in values]
+
+    def update_scrollregion(self):
+        width, height = self.get_scaled_size()
+        self.canvas.config(scrollregion=(0, 0, width, height))
+
+    def set_zoom(self, zoom, anchor_x=0, anchor_y=0):
+        if self.image is None or zoom == self.zoom:
+            return False
+
+        # keep the image pixel below the anchor (window coordinates) in place
+        image_x, image_y = self.to_image(self.canvas.canvasx(anchor_x), self.canvas.canvasy(anchor_y))
+
+        self.clear_tiles()
+        self.zoom = zoom
+        self.update_scrollregion()
+
+        width, height = self.get_scaled_size()
+        canvas_x, canvas_y = self.to_canvas(image_x, image_y)
+        self.canvas.xview_moveto(max(0, canvas_x - anchor_x) / width)
+        self.canvas.yview_moveto(max(0, canvas_y - anchor_y) / height)
+
+        self.render()
+        return True
+
+    def zoom_in(self, anchor_x=0, anchor_y=0):
+        index = ZOOM_LEVELS.index(self.zoom)
+        return self.set_zoom(ZOOM_LEVELS[min(index + 1, len(ZOOM_LEVELS) - 1)], anchor_x, anchor_y)
+
+    def zoom_out(self, anchor_x=0, anchor_y=0):
+        index = ZOOM_LEVELS.index(self.zoom)
+        return self.set_zoom(ZOOM_LEVELS[max(index - 1, 0)], anchor_x, anchor_y)
+
+    def schedule_render(self):
+        if self.render_scheduled:
+            return
+        self.render_scheduled = True
+        self.canvas.after_idle(self.render)
+
+    def render(self):
+        self.render_scheduled = False
+        if self.image is None:
+            return
+
+        level, scale = self.get_level_and_scale()
+        source = self.get_level(level)
+        width, height = source.width * scale, source.height * scale
+
+        view_x = self.canvas.canvasx(0)
+        view_y = self.canvas.canvasy(0)
+        view_width = max(self.canvas.winfo_width(), 1)
+        view_height = max(self.canvas.winfo_height(), 1)
+
+        tile_size = self.tile_size
+        columns = range(max(int(view_x // tile_size), 0),
+                        min(int((view_x + view_width) // tile_size), (width - 1) // tile_size) + 1)
+        rows = range(max(int(view_y // tile_size), 0),
+                     min(int((view_y + view_height) // tile_size), (height - 1) // tile_size) + 1)
+        visible = {(column, row) for column in columns for row in rows}
+
+        for key in list(self.tiles):
+            if key not in visible:
+                item_id, _ = self.tiles.pop(key)
+                self.canvas.delete(item_id)
+
+        for column, row in visible:
+            if (column, row) in self.tiles:
+                continue
+
+            x1, y1 = column * tile_size, row * tile_size
+            x2, y2 = min(x1 + tile_size, width), min(y1 + tile_size, height)
+            tile = source.crop((x1 // scale, y1 // scale, x2 // scale, y2 // scale))
+            if scale != 1:
+                tile = tile.resize((x2 - x1, y2 - y1), Image.NEAREST)
+
+            photo_image = ImageTk.PhotoImage(tile)
+            item_id = self.canvas.create_image(x1, y1, anchor="nw", image=photo_image, tags=("tile",))
+            self.tiles[(column, row)] = (item_id, photo_image)
+
+        self.canvas.tag_lower("tile")
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+from background import BackgroundPool
+
+TRACKING_WORKERS = 2
+TRACKING_CROP_SIZE = 128  # longest side of the downscaled search region
+SEARCH_MARGIN = 0.5  # search region around a bbox, relative to its size
+MIN_SEARCH_MARGIN = 16
+MIN_PEAK = 0.08  # weaker correlation peaks are treated as "no reliable motion"
+MAX_TRACKED_PAIRS = 8
+
+
+def load_grayscale(image_path):
+    with Image.open(image_path) as image:
+        return image.convert('L')
+
+
+def phase_correlate(previous_crop, next_crop):
+    # returns the shift (dx, dy) of the content from previous_crop to next_crop and the height of the peak
+    height, width = previous_crop.shape
+    window = np.outer(np.hanning(height), np.hanning(width))
+    previous_spectrum = np.fft.rfft2((previous_crop - previous_crop.mean()) * window)
+    next_spectrum = np.fft.rfft2((next_crop - next_crop.mean()) * window)
+
+    cross_power = next_spectrum * np.conj(previous_spectrum)
+    cross_power /= np.abs(cross_power) + 1e-9
+    correlation = np.fft.irfft2(cross_power, s=(height, width))
+
+    peak_y, peak_x = np.unravel_index(np.argmax(correlation), correlation.shape)
+    peak = correlation[peak_y, peak_x]
+
+    # the peak is refined to sub-pixel precision, since one pixel of a downscaled crop spans several image pixels
+    dx = peak_x + get_subpixel_offset(correlation[peak_y, [peak_x - 1, peak_x, (peak_x + 1) % width]])
+    dy = peak_y + get_subpixel_offset(correlation[[peak_y - 1, peak_y, (peak_y + 1) % height], peak_x])
+    if dy > height / 2:
+        dy -= height
+    if dx > width / 2:
+        dx -= width
+    return float(dx), float(dy), float(peak)
+
+
+def get_subpixel_offset(values):
+    # vertex of the parabola through three neighbouring correlation values
+    left, center, right = values
+    denominator = left - 2 * center + right
+    if denominator >= 0:
+        return 0.0
+    return float(np.clip(0.5 * (left - right) / denominator, -0.5, 0.5))
+
+
+def get_search_region(coordinates, image_width, image_height):
+    x1, y1, x2, y2 = coordinates
+    margin_x = max(MIN_SEARCH_MARGIN, int((x2 - x1 + 1) * SEARCH_MARGIN))
+    margin_y = max(MIN_SEARCH_MARGIN, int((y2 - y1 + 1) * SEARCH_MARGIN))
+    return (max(0, x1 - margin_x), max(0, y1 - margin_y),
+            min(image_width, x2 + margin_x + 1), min(image_height, y2 + margin_y + 1))
+
+
+def get_crop(image, region, size):
+    return np.asarray(image.crop(region).resize(size, Image.Resampling.BILINEAR), dtype=np.float32)
+
+
+def estimate_shift(previous_image, next_image, coordinates):
+    region = get_search_region(coordinates, previous_image.width, previous_image.height)
+    region_width, region_height = region[2] - region[0], region[3] - region[1]
+    if region_width < 2 or region_height < 2:
+        return 0, 0
+
+    scale = min(1.0, TRACKING_CROP_SIZE / max(region_width, region_height))
+    size = (max(2, round(region_width * scale)), max(2, round(region_height * scale)))
+
+    dx, dy, peak = phase_correlate(get_crop(previous_image, region, size), get_crop(next_image, region, size))
+    if peak < MIN_PEAK:
+        return 0, 0
+    return round(dx * region_width / size[0]), round(dy * region_height / size[1])
+
+
+def shift_bbox(coordinates, dx, dy, image_width, image_height):
+    # the bbox keeps its size and is shifted at most up to the image border
+    x1, y1, x2, y2 = coordinates
+    dx = max(-x1, min(dx, image_width - 1 - x2))
+    dy = max(-y1, min(dy, image_height - 1 - y2))
+    return x1 + dx, y1 + dy, x2 + dx, y2 + dy
+
+
+def track_bboxes(previous_path, next_path, bbox_coordinates):
+    # moves every bbox of the previous frame by the motion estimated around it
+    if not bbox_coordinates:
+        return []
+
+    previous_image = load_grayscale(previous_path)
+    next_image = load_grayscale(next_path)
+    if previous_image.size != next_image.size:
+        return [tuple(coordinates) for coordinates in bbox_coordinates]
+
+    tracked = []
+    for coordinates in bbox_coordinates:
+        dx, dy = estimate_shift(previous_image, next_image, coordinates)
+        tracked.append(shift_bbox(coordinates, dx, dy, next_image.width, next_image.height))
+    return tracked
+
+
+class MotionTracker:
+    def __init__(self, workers=TRACKING_WORKERS):
+        self.pool = BackgroundPool(workers, MAX_TRACKED_PAIRS)  # keyed by (previous path, next path, coordinates)
+
+    def submit(self, previous_path, next_path, bbox_coordinates):
+        key = (previous_path, next_path, tuple(tuple(coordinates) for coordinates in bbox_coordinates))
+        return self.pool.submit(key, track_bboxes, previous_path, next_path, list(key[2]))
+
+    def track(self, previous_path, next_path, bbox_coordinates):
+        if not bbox_coordinates:
+            return []
+        try:
+            return self.submit(previous_path, next_path, bbox_coordinates).result()
+        except BrokenProcessPool as error:
+            print(f'Tracking workers stopped: {error}')
+            self.pool.shutdown()
+        except (OSError, ValueError) as error:
+            print(f'Could not track bboxes from {previous_path} to {next_path}: {error}')
+        return list(bbox_coordinates)
+
+    def shutdown(self):
+        self.pool.shutdown()
@@ -0,0 +1,40 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+
+from synthetic import create_annotations, generate_label_directory  # noqa: E402  also makes src importable
+
+WIDTH = 640
+HEIGHT = 480
+BOXES = 5
+HOI_DENSITY = 1.0  # every frame has interactions
+FRAMES = 40
+
+
+def create_store(rng, boxes=BOXES):
+    return create_annotations(rng, WIDTH, HEIGHT, boxes, HOI_DENSITY)
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.fixture
+def rng():
+    return random.Random(0)
+
+
+@pytest.fixture
+def label_directory(tmp_path):
+    directory = str(tmp_path / "labels")
+    generate_label_directory(directory, FRAMES, WIDTH, HEIGHT, BOXES, HOI_DENSITY)
+    return directory
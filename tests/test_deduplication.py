@@ -0,0 +1,36 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from deduplication import HammingIndex, cluster_hashes, get_distance
+
+
+@pytest.mark.parametrize("threshold", [0, 4, 10])
+def test_search_finds_every_hash_within_the_threshold(rng, threshold):
+    hashes = [rng.getrandbits(64) for _ in range(200)]
+    # near copies, so that the threshold is actually reached
+    hashes += [hash_value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for hash_value in hashes[:100]]
+    index = HammingIndex(64, threshold)
+    for hash_value in hashes:
+        index.add(hash_value)
+
+    for query in hashes[:50] + [rng.getrandbits(64) for _ in range(50)]:
+        expected = {(position, get_distance(query, hash_value)) for position, hash_value in enumerate(hashes)
+                    if get_distance(query, hash_value) <= threshold}
+        assert set(index.search(query)) == expected
+
+
+def test_clusters_do_not_chain():
+    # every frame differs from the previous one in one more bit, like a slow camera pan
+    hashes = [(1 << bits) - 1 for bits in range(12)] + [None]
+    assignment = cluster_hashes(hashes, threshold=4)
+    assert assignment == [0] * 5 + [5] * 5 + [10, 10, 12]
+    assert all(get_distance(hashes[position], hashes[representative]) <= 4
+               for position, representative in enumerate(assignment) if hashes[position] is not None)
+
+
+def test_invalid_threshold():
+    with pytest.raises(ValueError):
+        HammingIndex(64, 64)
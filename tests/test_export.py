@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+
+from export import DUPLICATES_NAME, export_annotations, get_label_file_name
+from synthetic import get_image_name, write_frame
+
+from .conftest import FRAMES, HEIGHT, WIDTH, create_store, read_bytes
+
+
+def export_both(label_directory, tmp_path, fan_out=False):
+    incremental_path = str(tmp_path / "incremental.odgt")
+    full_path = str(tmp_path / "full.odgt")
+    result = export_annotations(label_directory, incremental_path, workers=2, fan_out=fan_out)
+    export_annotations(label_directory, full_path, workers=2, incremental=False, fan_out=fan_out)
+    assert read_bytes(incremental_path) == read_bytes(full_path)
+    return result
+
+
+def touch_later(label_directory, index):
+    # the manifest compares mtimes, which a fast rewrite may leave unchanged
+    path = get_label_file_name(get_image_name(index), label_directory)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_full_export_writes_sorted_records(label_directory, tmp_path):
+    total, changed = export_both(label_directory, tmp_path)
+    assert total == changed == FRAMES
+
+    lines = read_bytes(str(tmp_path / "full.odgt")).splitlines()
+    assert [json.loads(line)["file_name"] for line in lines] == [get_image_name(index) for index in range(FRAMES)]
+
+
+def test_incremental_export_matches_full_export(label_directory, tmp_path, rng):
+    export_both(label_directory, tmp_path)
+    assert export_both(label_directory, tmp_path) == (FRAMES, 0)
+
+    write_frame(label_directory, 3, create_store(rng, boxes=7), WIDTH, HEIGHT)
+    touch_later(label_directory, 3)
+    write_frame(label_directory, FRAMES, create_store(rng), WIDTH, HEIGHT)
+    os.remove(get_label_file_name(get_image_name(10), label_directory))
+    assert export_both(label_directory, tmp_path) == (FRAMES, 2)
+
+
+def test_duplicates_receive_the_labels_of_their_representative(label_directory, tmp_path):
+    os.remove(get_label_file_name(get_image_name(5), label_directory))
+    with open(os.path.join(label_directory, DUPLICATES_NAME), 'w') as file:
+        json.dump({"clusters": {get_image_name(4): [get_image_name(5), get_image_name(6)]}}, file)
+    export_both(label_directory, tmp_path, fan_out=True)
+
+    records = {json.loads(line)["file_name"]: json.loads(line)
+               for line in read_bytes(str(tmp_path / "full.odgt")).splitlines()}
+    assert len(records) == FRAMES
+    # an unlabeled duplicate receives the labels of its representative, a labeled one keeps its own
+    assert dict(records[get_image_name(5)], file_name=get_image_name(4)) == records[get_image_name(4)]
+    assert records[get_image_name(6)] != records[get_image_name(4)]
+
+    touch_later(label_directory, 4)
+    assert export_both(label_directory, tmp_path, fan_out=True) == (FRAMES, 2)
+
+    # without deduplication the duplicates file is ignored
+    assert export_both(label_directory, tmp_path) == (FRAMES - 1, 0)
@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+from history import AddBBox, AddInteraction, CommandHistory, DeleteBBox, DeleteInteraction, MoveBBox
+from misc.annotations import BBox, Interaction
+from synthetic import INTERACTION_TAGS, OBJECT_TAGS
+
+from .conftest import create_store
+
+
+def get_state(store):
+    # everything an edit can change, including the bbox -> interactions links that the GUI draws from
+    return (store.to_odgt("frame.jpg", 640, 480),
+            {bbox_index: sorted(indexes) for bbox_index, indexes in store.bbox_interactions.items()})
+
+
+def create_command(rng, store):
+    # commands as the GUI creates them
+    choice = rng.randrange(5)
+    if choice == 0 or not store.bboxes:
+        return AddBBox(len(store.bboxes), BBox((1, 2, 30, 40), rng.choice(OBJECT_TAGS), "object"))
+    idx = rng.randrange(len(store.bboxes))
+    if choice == 1:
+        return MoveBBox(idx, store.bboxes[idx].coordinates, (idx, idx, idx + 10, idx + 20))
+    if choice == 2:
+        # interactions are removed from the highest index down
+        interaction_indexes = sorted(store.bbox_interactions.get(idx, ()), reverse=True)
+        return DeleteBBox(idx, store.bboxes[idx], [(i, store.interactions[i]) for i in interaction_indexes])
+    if choice == 3 or not store.interactions:
+        interaction = Interaction(idx, rng.randrange(len(store.bboxes)), rng.choice(INTERACTION_TAGS))
+        return AddInteraction(len(store.interactions), interaction)
+    idx = rng.randrange(len(store.interactions))
+    return DeleteInteraction(idx, store.interactions[idx])
+
+
+def test_undo_restores_every_state_and_redo_replays_them(rng):
+    store = create_store(rng, boxes=6)
+    history = CommandHistory()
+    states = [get_state(store)]
+    for _ in range(200):
+        history.execute(create_command(rng, store), store)
+        states.append(get_state(store))
+
+    for state in reversed(states[:-1]):
+        assert history.undo(store)
+        assert get_state(store) == state
+    assert not history.undo(store)
+
+    for state in states[1:]:
+        assert history.redo(store)
+        assert get_state(store) == state
+    assert not history.redo(store)
+
+
+def test_push_clears_redo(rng):
+    store = create_store(rng)
+    history = CommandHistory()
+    history.execute(AddBBox(len(store.bboxes), BBox((0, 0, 5, 5), "person", "person")), store)
+    history.undo(store)
+    history.push(MoveBBox(0, store.bboxes[0].coordinates, store.bboxes[0].coordinates))
+    assert not history.redo(store)
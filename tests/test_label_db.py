@@ -0,0 +1,55 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+
+import pytest
+
+from export import DUPLICATES_NAME, export_annotations, load_duplicates
+from label_db import LabelDatabase
+from synthetic import get_image_name
+
+from .conftest import FRAMES, read_bytes
+
+
+@pytest.fixture
+def database(label_directory, tmp_path):
+    database = LabelDatabase(str(tmp_path / "labels.sqlite"))
+    database.import_label_directory(label_directory)
+    yield database
+    database.close()
+
+
+def test_export_matches_label_directory_export(database, label_directory, tmp_path):
+    assert len(database) == FRAMES
+    txt_path = str(tmp_path / "txt.odgt")
+    database_path = str(tmp_path / "database.odgt")
+    export_annotations(label_directory, txt_path, incremental=False)
+    database.export_odgt(database_path)
+    assert read_bytes(database_path) == read_bytes(txt_path)
+
+
+def test_export_with_duplicates_matches_label_directory_export(database, label_directory, tmp_path):
+    # duplicates sort before, between and after the labeled frames; one of them has labels of its own
+    clusters = {get_image_name(3): ["a.jpg", get_image_name(5), "frame_000003b.jpg", "z.jpg"]}
+    with open(os.path.join(label_directory, DUPLICATES_NAME), 'w') as file:
+        json.dump({"clusters": clusters}, file)
+
+    txt_path = str(tmp_path / "txt.odgt")
+    database_path = str(tmp_path / "database.odgt")
+    export_annotations(label_directory, txt_path, incremental=False, fan_out=True)
+    database.export_odgt(database_path, load_duplicates(label_directory))
+    assert read_bytes(database_path) == read_bytes(txt_path)
+    assert len(read_bytes(database_path).splitlines()) == FRAMES + 3
+
+
+def test_label_directory_round_trip(database, label_directory, tmp_path):
+    exported_directory = str(tmp_path / "exported")
+    assert database.export_label_directory(exported_directory) == FRAMES
+    assert sorted(os.listdir(exported_directory)) == sorted(os.listdir(label_directory))
+    for name in os.listdir(label_directory):
+        with open(os.path.join(label_directory, name), 'r') as file:
+            expected = json.load(file)
+        assert database.read(expected["file_name"]) == expected
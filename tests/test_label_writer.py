@@ -0,0 +1,31 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+
+from label_writer import LabelWriter
+
+
+def test_flush_writes_the_latest_data(tmp_path):
+    writer = LabelWriter(delay=60)
+    path = str(tmp_path / "frame.txt")
+    writer.save(path, {"version": 1})
+    writer.save(path, {"version": 2})
+    assert writer.get_pending(path) == {"version": 2}
+
+    writer.flush()
+    with open(path, 'r') as file:
+        assert json.load(file) == {"version": 2}
+    assert writer.get_pending_count() == 0
+
+
+def test_failed_write_does_not_stop_the_writer(tmp_path):
+    writer = LabelWriter(delay=0)
+    writer.save(str(tmp_path / "broken.txt"), {"value": object()})
+    writer.save(str(tmp_path / "frame.txt"), {"value": 1})
+    writer.flush()
+
+    assert writer.worker.is_alive()
+    assert os.listdir(tmp_path) == ["frame.txt"]
@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: 2025 2025 lremane
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+
+import pytest
+
+import odgt_to_hico
+from odgt_to_hico import convert_file, convert_file_sharded
+from synthetic import get_image_name
+
+from .conftest import HEIGHT, WIDTH, create_store, read_bytes
+
+RECORDS = 100
+
+
+@pytest.fixture
+def odgt_path(tmp_path, rng):
+    stores = [create_store(rng) for _ in range(RECORDS)]
+    stores[17].bboxes[0].tag = "unicorn"
+    stores[60].interactions[0].interaction = "juggle"
+    path = str(tmp_path / "input.odgt")
+    with open(path, 'w') as file:
+        for index, store in enumerate(stores):
+            file.write(json.dumps(store.to_odgt(get_image_name(index), WIDTH, HEIGHT)) + '\n')
+    return path
+
+
+def test_convert_file_writes_hico(odgt_path, tmp_path):
+    output_path = str(tmp_path / "hico.json")
+    count, report = convert_file(odgt_path, output_path, chunk_size=7)
+    assert count == RECORDS - 2
+    assert sorted(report.tags) == [("interaction", "juggle"), ("object", "unicorn")]
+    assert report.skipped_lines == {18, 61}
+
+    records = json.loads(read_bytes(output_path))
+    assert len(records) == RECORDS - 2
+    assert records[0]["file_name"] == get_image_name(0)
+
+
+@pytest.mark.parametrize("shards", [1, 3, RECORDS, RECORDS + 50])
+def test_sharded_output_matches_unsharded(odgt_path, tmp_path, shards):
+    unsharded_path = str(tmp_path / "unsharded.json")
+    sharded_path = str(tmp_path / "sharded.json")
+    convert_file(odgt_path, unsharded_path)
+    count, report = convert_file_sharded(odgt_path, sharded_path, shards)
+
+    assert read_bytes(sharded_path) == read_bytes(unsharded_path)
+    assert count == RECORDS - 2
+    assert report.skipped_lines == {18, 61}
+    assert not os.path.exists(sharded_path + odgt_to_hico.SHARDS_SUFFIX)
+
+
+def test_resume_converts_only_failed_shards(odgt_path, tmp_path, monkeypatch):
+    converted_shards = []
+    convert_shard = odgt_to_hico.convert_shard
+
+    def record_shard(task):
+        converted_shards.append(task[1])
+        return convert_shard(task)
+
+    monkeypatch.setattr(odgt_to_hico, "convert_shard", record_shard)
+
+    with open(odgt_path, 'r') as file:
+        lines = file.readlines()
+    good_line = lines[80]
+    lines[80] = '{"file_name": \n'
+    with open(odgt_path, 'w') as file:
+        file.writelines(lines)
+
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    (work_dir / "keep.txt").write_text("not written by the conversion")
+    output_path = str(tmp_path / "sharded.json")
+    assert convert_file_sharded(odgt_path, output_path, 4, work_dir=str(work_dir)) == (None, None)
+    assert sorted(converted_shards) == [0, 1, 2, 3]
+
+    # records 75-99 form the last shard
+    converted_shards.clear()
+    lines[80] = good_line
+    with open(odgt_path, 'w') as file:
+        file.writelines(lines)
+    count, _ = convert_file_sharded(odgt_path, output_path, 4, work_dir=str(work_dir), resume=True)
+    assert converted_shards == [3]
+    assert count == RECORDS - 2
+
+    convert_file(odgt_path, str(tmp_path / "unsharded.json"))
+    assert read_bytes(output_path) == read_bytes(str(tmp_path / "unsharded.json"))
+    assert os.listdir(work_dir) == ["keep.txt"]